@@ -1,82 +1,706 @@
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import argparse
+import time
+import os
+import json
+import sqlite3
+import threading
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+from urllib.parse import urljoin, urlsplit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
+# lxml makes parsing much faster; without it pages are parsed by BeautifulSoup's html.parser
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
 BASE_URL = "https://books.toscrape.com/"
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 
+# Requests in flight at once across the whole crawl (listing and detail pages together)
+CRAWL_CONCURRENCY = 10
+
+# asyncio engine (httpx, imported only when used): far more requests in flight than threads allow
+ASYNC_CONCURRENCY = 200
+HOST_DELAY = 0.002  # seconds between request starts to the same host
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled after each failed attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Parse only the parts of a page that are read when falling back to BeautifulSoup
+LISTING_STRAINER = SoupStrainer(class_=["product_pod", "next"])
+DETAIL_STRAINER = SoupStrainer("ul", class_="breadcrumb")
+CATEGORY_STRAINER = SoupStrainer("div", class_="side_categories")
+
+# XPath equivalents of the CSS selectors, for lxml
+HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+PRODUCT_XPATH = f"//article[{HAS_CLASS.format('product_pod')}]"
+PRICE_XPATH = f"(.//*[{HAS_CLASS.format('price_color')}])[1]"
+NEXT_XPATH = f"(//li[{HAS_CLASS.format('next')}]//a)[1]"
+GENRE_XPATH = f"(//ul[{HAS_CLASS.format('breadcrumb')}]//li[3]//a)[1]"
+CATEGORY_XPATH = f"//div[{HAS_CLASS.format('side_categories')}]//ul/li/ul/li/a"
+
+# Optional process pool for parsing, set up by fetch_books(parse_workers=N); None parses in the calling thread
+parse_pool = None
+
+# On-disk crawl cache (see open_cache): page bodies with their ETag/Last-Modified, each listing
+# page's finished book records and one row per crawl. Only used when fetch_books gets a cache_path.
+CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bookscraper_cache.sqlite3")
+cache_db = None
+cache_lock = threading.Lock()
+# Start of the crawl in progress; pages cached since then are reused without a request, so an
+# interrupted crawl picks up where it stopped
+crawl_started_at = None
+
 # Reuse connections for speed
 session = requests.Session()
 session.headers.update(HEADERS)
 
 
-def get_soup(url):
-    response = session.get(url)
+def open_cache(path=CACHE_DB_PATH):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, fetched_at REAL);
+        CREATE TABLE IF NOT EXISTS books (page_url TEXT, position INTEGER, title TEXT, price TEXT, rating TEXT, genre TEXT,
+                                          PRIMARY KEY (page_url, position));
+        -- started_at is the current (or last) crawl; finished_at and page_urls the last one that finished
+        CREATE TABLE IF NOT EXISTS crawls (start_url TEXT PRIMARY KEY, started_at REAL, finished_at REAL, page_urls TEXT);
+    """)
+    return db
+
+
+def cache_lookup(url):
+    """(etag, last_modified, body, fetched_at) cached for url, or None."""
+    if cache_db is None:
+        return None
+    with cache_lock:
+        return cache_db.execute("SELECT etag, last_modified, body, fetched_at FROM pages WHERE url = ?", (url,)).fetchone()
+
+
+def cache_store(url, etag, last_modified, body):
+    """Cache a new copy of url; book records saved from its old copy no longer apply."""
+    if cache_db is None:
+        return
+    with cache_lock, cache_db:
+        cache_db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)", (url, etag, last_modified, body, time.time()))
+        cache_db.execute("DELETE FROM books WHERE page_url = ?", (url,))
+
+
+def cache_touch(url):
+    """Mark the cached copy of url as revalidated now (after a 304)."""
+    if cache_db is None:
+        return
+    with cache_lock, cache_db:
+        cache_db.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+
+def revalidation_headers(cached):
+    headers = {}
+    if cached and cached[0]:
+        headers["If-None-Match"] = cached[0]
+    if cached and cached[1]:
+        headers["If-Modified-Since"] = cached[1]
+    return headers
+
+
+def fresh_in_crawl(cached):
+    return cached is not None and crawl_started_at is not None and cached[3] >= crawl_started_at
+
+
+def fetch_page(url):
+    """Page bytes and whether they changed since the cached copy (always True without a cache)."""
+    cached = cache_lookup(url)
+    if fresh_in_crawl(cached):
+        return cached[2], False
+    response = session.get(url, headers=revalidation_headers(cached))
+    if response.status_code == 304 and cached:
+        cache_touch(url)
+        return cached[2], False
     response.raise_for_status()
+    cache_store(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), response.content)
+    return response.content, True
+
+
+def get_page(url):
+    return fetch_page(url)[0]
+
+
+def save_page_books(page_url, books):
+    """Checkpoint a listing page whose books all have their genre."""
+    if cache_db is None:
+        return
+    with cache_lock, cache_db:
+        cache_db.executemany("INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?)",
+                             [(page_url, i, b["title"], b["price"], b["rating"], b["genre"]) for i, b in enumerate(books)])
 
+
+def load_page_books(page_url, count, db=None):
+    """The saved books of a listing page, or None unless all count of them were saved."""
+    db = db or cache_db
+    if db is None:
+        return None
+    with cache_lock:
+        rows = db.execute("SELECT title, price, rating, genre FROM books WHERE page_url = ? ORDER BY position", (page_url,)).fetchall()
+    if count is not None and len(rows) != count:
+        return None
+    return [{"title": title, "price": price, "rating": rating, "genre": genre} for title, price, rating, genre in rows]
+
+
+def begin_crawl(start_url):
+    """
+    Start a crawl of start_url, or resume the unfinished one; returns when it started.
+    The last finished crawl's page list is kept until this one finishes too.
+    """
+    with cache_lock, cache_db:
+        row = cache_db.execute("SELECT started_at, finished_at FROM crawls WHERE start_url = ?", (start_url,)).fetchone()
+        if row and (row[1] is None or row[0] > row[1]):
+            return row[0]
+        started_at = time.time()
+        if row:
+            cache_db.execute("UPDATE crawls SET started_at = ? WHERE start_url = ?", (started_at, start_url))
+        else:
+            cache_db.execute("INSERT INTO crawls VALUES (?, ?, NULL, NULL)", (start_url, started_at))
+        return started_at
+
+
+def finish_crawl(start_url, page_urls):
+    with cache_lock, cache_db:
+        cache_db.execute("UPDATE crawls SET finished_at = ?, page_urls = ? WHERE start_url = ?",
+                         (time.time(), json.dumps(page_urls), start_url))
+
+
+def load_saved_books(start_url=BASE_URL, path=CACHE_DB_PATH):
+    """(books, finished_at) from the last completed crawl of start_url saved at path, or (None, None)."""
+    if not os.path.exists(path):
+        return None, None
+    db = open_cache(path)
+    try:
+        row = db.execute("SELECT finished_at, page_urls FROM crawls WHERE start_url = ?", (start_url,)).fetchone()
+        if not row or row[0] is None:
+            return None, None
+        books = []
+        for page_url in json.loads(row[1]):
+            books += load_page_books(page_url, None, db)
+        return books, row[0]
+    finally:
+        db.close()
+
+
+def get_soup(url):
+    return make_soup(get_page(url))
+
+
+def make_soup(content, parse_only=None):
     # Use raw bytes for best Unicode handling
-    return BeautifulSoup(response.content, "html.parser")
+    return BeautifulSoup(content, "html.parser", parse_only=parse_only)
+
+
+def lxml_document(content):
+    """Parse page bytes with lxml, decoding them the way BeautifulSoup would if they aren't UTF-8."""
+    try:
+        content.decode("utf-8")
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = UnicodeDammit(content, is_html=True).original_encoding
+    return lxml.html.document_fromstring(content, parser=lxml.html.HTMLParser(encoding=encoding))
+
+
+def genre_from_soup(soup):
+    genre_tag = soup.select_one('ul.breadcrumb li:nth-of-type(3) a')
+    return genre_tag.text.strip() if genre_tag else "Unknown"
+
+
+def genre_from_html(content):
+    """The breadcrumb genre from a book page's bytes."""
+    if lxml is None:
+        return genre_from_soup(make_soup(content, DETAIL_STRAINER))
+    genre_tag = lxml_document(content).xpath(GENRE_XPATH)
+    return genre_tag[0].text_content().strip() if genre_tag else "Unknown"
+
+
+def run_parser(func, *args):
+    """func(*args) in the parse pool if one is running, else right here."""
+    if parse_pool is None:
+        return func(*args)
+    return parse_pool.submit(func, *args).result()
+
+
+async def run_parser_async(func, *args):
+    if parse_pool is None:
+        return func(*args)
+    return await asyncio.wrap_future(parse_pool.submit(func, *args))
 
 
 def get_book_details(book_url):
     try:
-        soup = get_soup(book_url)
-        genre_tag = soup.select_one('ul.breadcrumb li:nth-of-type(3) a')
-        return genre_tag.text.strip() if genre_tag else "Unknown"
+        return run_parser(genre_from_html, get_page(book_url))
     except:
         return "Unknown"
 
 
-def fetch_books(start_url):
+def parse_listing(url, with_categories=False):
+    """
+    Fetch one catalogue page: (books without genre, their detail URLs, next page URL or None,
+    the sidebar's (genre, category URL) pairs if with_categories else [], and the books saved
+    from the last crawl if the page hasn't changed since, else None).
+    """
+    content, changed = fetch_page(url)
+    books, book_urls, next_url = run_parser(listing_from_html, content, url)
+    categories = run_parser(categories_from_html, content, url) if with_categories else []
+    saved = None if changed else load_page_books(url, len(books))
+    return books, book_urls, next_url, categories, saved
+
+
+def listing_from_soup(soup, url):
     books = []
-    url = start_url
-    page_num = 1
+    book_urls = []
+    for article in soup.select('article.product_pod'):
+        books.append({
+            "title": article.h3.a['title'],
+            "price": article.select_one('.price_color').text.strip(),
+            "rating": article.p['class'][1],
+        })
+        book_urls.append(urljoin(url, article.h3.a['href']))
 
-    while url:
-        print(f"\nScraping page {page_num}: {url}")
-        soup = get_soup(url)
+    next_button = soup.select_one('li.next a')
+    next_url = urljoin(url, next_button['href']) if next_button else None
+    return books, book_urls, next_url
 
-        articles = soup.select('article.product_pod')
 
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            tasks = []
+def listing_from_html(content, url):
+    """listing_from_soup for a catalogue page's bytes, through lxml when it is installed."""
+    if lxml is None:
+        return listing_from_soup(make_soup(content, LISTING_STRAINER), url)
 
-            for article in articles:
-                title = article.h3.a['title']
-                price = article.select_one('.price_color').text.strip()
-                rating = article.p['class'][1]
+    document = lxml_document(content)
+    books = []
+    book_urls = []
+    for article in document.xpath(PRODUCT_XPATH):
+        link = article.xpath("((.//h3)[1]//a)[1]")[0]
+        books.append({
+            "title": link.get('title'),
+            "price": article.xpath(PRICE_XPATH)[0].text_content().strip(),
+            "rating": article.xpath("(.//p)[1]")[0].get('class').split()[1],
+        })
+        book_urls.append(urljoin(url, link.get('href')))
+
+    next_button = document.xpath(NEXT_XPATH)
+    next_url = urljoin(url, next_button[0].get('href')) if next_button else None
+    return books, book_urls, next_url
+
+
+def categories_from_soup(soup, url):
+    return [(a.text.strip(), urljoin(url, a['href'])) for a in soup.select('div.side_categories ul li ul li a')]
+
+
+def categories_from_html(content, url):
+    """(genre, category URL) for every category in a catalogue page's sidebar."""
+    if lxml is None:
+        return categories_from_soup(make_soup(content, CATEGORY_STRAINER), url)
+    return [(a.text_content().strip(), urljoin(url, a.get('href'))) for a in lxml_document(content).xpath(CATEGORY_XPATH)]
+
+
+def benchmark_parsing(url=BASE_URL, rounds=200):
+    """
+    Pages parsed per second for one catalogue page and its first book page: the old full
+    html.parser parse against the current parsing layer. Both must agree on the results.
+    """
+    listing = get_page(url)
+    book_url = listing_from_html(listing, url)[1][0]
+    detail = get_page(book_url)
+    assert listing_from_soup(make_soup(listing), url) == listing_from_html(listing, url)
+    assert genre_from_soup(make_soup(detail)) == genre_from_html(detail)
+
+    cases = {
+        "listing_full_html_parser": lambda: listing_from_soup(make_soup(listing), url),
+        "listing_current": lambda: listing_from_html(listing, url),
+        "detail_full_html_parser": lambda: genre_from_soup(make_soup(detail)),
+        "detail_current": lambda: genre_from_html(detail),
+    }
+    rates = {"parser": "lxml" if lxml is not None else "html.parser + SoupStrainer"}
+    for name, parse in cases.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            parse()
+        rates[name] = round(rounds / (time.perf_counter() - start))
+    return rates
+
+
+MIRROR_GENRES = ["Travel", "Mystery", "Poetry", "History", "Fiction", "Romance", "Fantasy", "Horror", "Science", "Humor"]
+
+
+def mirror_server(latency=0.05, pages=50, per_page=20):
+    """
+    A local stand-in for books.toscrape.com: pages catalogue pages of per_page books, each book's
+    page and paginated category listings, answered after latency seconds. Book i's genre is
+    MIRROR_GENRES[i % 10]. Returns (server, base URL); server.requests counts the requests served.
+    Run server.serve_forever() in a thread and call server.shutdown() when done.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    def pod(i, prefix):
+        return (f'<article class="product_pod"><h3><a href="{prefix}book_{i}/index.html" title="Book {i}">Book {i}</a></h3>'
+                f'<p class="star-rating Three"></p><p class="price_color">£{i % 50 + 10}.99</p></article>')
 
-                relative_link = article.h3.a['href']
-                book_url = urljoin(url, relative_link)
+    def pager(next_href):
+        return f'<ul class="pager"><li class="next"><a href="{next_href}">next</a></li></ul>' if next_href else ""
 
-                future = executor.submit(get_book_details, book_url)
+    sidebar = ('<div class="side_categories"><ul><li><a href="/catalogue/category/books_1/index.html">Books</a><ul>'
+               + "".join(f'<li><a href="/catalogue/category/books/{genre.lower()}_{k + 2}/index.html">{genre}</a></li>'
+                         for k, genre in enumerate(MIRROR_GENRES))
+               + "</ul></li></ul></div>")
 
-                tasks.append({
-                    "title": title,
-                    "price": price,
-                    "rating": rating,
-                    "future": future
-                })
+    def listing(page):
+        prefix = "catalogue/" if page == 1 else ""
+        books = "".join(pod(i, prefix) for i in range((page - 1) * per_page, page * per_page))
+        next_href = f"{prefix}page-{page + 1}.html" if page < pages else None
+        return f"<html><body>{sidebar}{books}{pager(next_href)}</body></html>"
 
-            # Progress bar per page
-            for task in tqdm(tasks, desc=f"Processing page {page_num}", leave=False):
-                genre = task["future"].result()
+    def category(genre, page):
+        ids = [i for i in range(pages * per_page) if MIRROR_GENRES[i % len(MIRROR_GENRES)] == genre]
+        books = "".join(pod(i, "../../../") for i in ids[(page - 1) * per_page:page * per_page])
+        next_href = f"page-{page + 1}.html" if page * per_page < len(ids) else None
+        return f"<html><body>{books}{pager(next_href)}</body></html>"
 
-                books.append({
-                    "title": task["title"],
-                    "price": task["price"],
-                    "rating": task["rating"],
-                    "genre": genre
-                })
+    def detail(i):
+        return (f'<html><body><ul class="breadcrumb"><li><a href="/">Home</a></li><li><a href="/books">Books</a></li>'
+                f'<li><a href="/genre">{MIRROR_GENRES[i % len(MIRROR_GENRES)]}</a></li><li class="active">Book {i}</li></ul></body></html>')
 
-        # Handle pagination
-        next_button = soup.select_one('li.next a')
-        url = urljoin(url, next_button['href']) if next_button else None
-        page_num += 1
+    def page_number(name):
+        return int(name.split("-")[1].split(".")[0]) if name.startswith("page-") else 1
 
-    return books
+    def body_for(path):
+        parts = path.strip("/").split("/")
+        if parts == [""] or parts == ["index.html"]:
+            return listing(1)
+        if len(parts) == 2 and parts[0] == "catalogue" and parts[1].startswith("page-"):
+            return listing(page_number(parts[1]))
+        if len(parts) == 3 and parts[0] == "catalogue" and parts[1].startswith("book_"):
+            return detail(int(parts[1].split("_")[1]))
+        if len(parts) == 5 and parts[:3] == ["catalogue", "category", "books"]:
+            return category(parts[3].split("_")[0].capitalize(), page_number(parts[4]))
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                server.requests += 1
+            time.sleep(latency)
+            body = body_for(urlsplit(self.path).path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    lock = threading.Lock()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.requests = 0
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def benchmark_crawl(latency=0.05, concurrency=None, pages=50):
+    """
+    Crawl a local mirror_server(latency) with each engine and genre mode (no cache). Reports the
+    wall time, the requests made and two lower bounds: requests / concurrency * latency, and the
+    listing pages' own chain (each next link is only known once its page is in). Every run must
+    return the mirror's books with the right genres.
+    """
+    server, base = mirror_server(latency, pages)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    engines = ["threads"]
+    try:
+        import httpx  # noqa: F401
+        engines.append("async")
+    except ImportError:
+        pass
+    results = {"latency_ms": latency * 1000, "books": pages * 20}
+    try:
+        for engine in engines:
+            in_flight = concurrency or (ASYNC_CONCURRENCY if engine == "async" else CRAWL_CONCURRENCY)
+            for genres in ("details", "index"):
+                before = server.requests
+                start = time.perf_counter()
+                books = fetch_books(base, in_flight, engine, genres=genres)
+                wall = time.perf_counter() - start
+                requests_made = server.requests - before
+                assert [book["genre"] for book in books] == [MIRROR_GENRES[i % len(MIRROR_GENRES)] for i in range(pages * 20)]
+                results[f"{engine}_{genres}"] = {
+                    "concurrency": in_flight,
+                    "requests": requests_made,
+                    "wall_s": round(wall, 2),
+                    "bound_s": round(requests_made / in_flight * latency, 2),
+                    "listing_chain_s": round(pages * latency, 2),
+                }
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def fetch_books(start_url, concurrency=None, engine="threads", parse_workers=0, genres="details", cache_path=None):
+    """
+    Crawl every catalogue page from start_url, returning books in catalogue order.
+
+    Listing and detail pages go through one work queue drained by a single pool, with at
+    most concurrency requests in flight. A listing page's next link is queued ahead of its
+    detail pages, so the next listing downloads while this page's details are fetched.
+    engine="async" runs the asyncio engine (crawl_async) instead, which returns the same records.
+    parse_workers > 0 parses pages in that many processes instead of the fetching threads.
+
+    genres="details" reads each book's genre from its own page. genres="index" crawls the
+    sidebar's category listings instead and looks books up by URL: one request per
+    category page rather than one per book, plus book pages only for books in no category.
+
+    With cache_path, pages are cached in that SQLite file and revalidated with ETag /
+    Last-Modified, listing pages that come back unchanged reuse their saved books without
+    any book page requests, and an interrupted crawl resumes from its checkpoints.
+    """
+    global parse_pool, cache_db, crawl_started_at
+    if cache_path:
+        cache_db = open_cache(cache_path)
+        crawl_started_at = begin_crawl(start_url)
+    if parse_workers:
+        parse_pool = ProcessPoolExecutor(max_workers=parse_workers)
+    try:
+        if engine == "async":
+            pages = asyncio.run(crawl_async(start_url, concurrency or ASYNC_CONCURRENCY, genres=genres))
+        else:
+            pages = crawl_threads(start_url, concurrency or CRAWL_CONCURRENCY, genres)
+        if cache_db is not None:
+            finish_crawl(start_url, [page_url for page_url, _ in pages])
+        return [book for _, books in pages for book in books]
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+            parse_pool = None
+        if cache_db is not None:
+            cache_db.close()
+            cache_db = None
+            crawl_started_at = None
+
+
+def crawl_threads(start_url, concurrency, genres="details"):
+    """fetch_books' threaded engine; returns (listing page URL, its books) in catalogue order."""
+    # Keep one pooled connection per worker
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    pages = []  # per listing page, (its URL, its list of book dicts)
+    missing = []  # per listing page, books still without a genre; at 0 the page is checkpointed
+    genre_index = {}  # book URL -> genre, from the category listings (genres="index")
+    unresolved = []  # (page, index, book URL) waiting for the category index
+    categories = []  # (genre, category URL) to index once a page actually needs genres
+    queue = deque([("page", start_url, 0)])
+    running = {}  # future -> (kind, url, position); position is the genre for category pages
+
+    def set_genre(page_num, index, genre):
+        pages[page_num][1][index]["genre"] = genre
+        missing[page_num] -= 1
+        if not missing[page_num]:
+            save_page_books(*pages[page_num])
+        progress.update()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor, tqdm(desc="Processing books", unit="book") as progress:
+        while queue or running or unresolved:
+            if not queue and not running:
+                # Every listing is in: join against the index, fetching book pages only for misses
+                for page_num, index, book_url in unresolved:
+                    if book_url in genre_index:
+                        set_genre(page_num, index, genre_index[book_url])
+                    else:
+                        queue.append(("detail", book_url, (page_num, index)))
+                unresolved = []
+                continue
+
+            while queue and len(running) < concurrency:
+                kind, url, position = queue.popleft()
+                if kind == "detail":
+                    future = executor.submit(get_book_details, url)
+                else:
+                    future = executor.submit(parse_listing, url, genres == "index" and kind == "page" and position == 0)
+                running[future] = (kind, url, position)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, url, position = running.pop(future)
+                if kind == "detail":
+                    set_genre(*position, future.result())
+                    continue
+
+                if kind == "category":
+                    try:
+                        _, book_urls, next_url, _, _ = future.result()
+                    except Exception as e:
+                        # Its books just miss the index and fall back to their own pages
+                        tqdm.write(f"Couldn't index category {position} ({url}): {e}")
+                        continue
+                    for book_url in book_urls:
+                        genre_index.setdefault(book_url, position)
+                    if next_url:
+                        queue.appendleft(("category", next_url, position))
+                    continue
+
+                books, book_urls, next_url, page_categories, saved = future.result()
+                categories.extend(page_categories)
+                tqdm.write(f"Scraped page {position + 1}: {url}" + (" (unchanged)" if saved else ""))
+                pages.append((url, saved or books))
+                missing.append(0 if saved else len(books))
+                progress.total = (progress.total or 0) + len(books)
+                progress.update(len(books) if saved else 0)
+                if next_url:
+                    queue.appendleft(("page", next_url, position + 1))
+                if saved:
+                    continue
+                if genres == "index":
+                    # Index only when some page changed; a fully unchanged re-run skips it
+                    queue.extend(("category", category_url, genre) for genre, category_url in categories)
+                    categories = []
+                    unresolved.extend((position, index, book_url) for index, book_url in enumerate(book_urls))
+                else:
+                    queue.extend(("detail", book_url, (position, index)) for index, book_url in enumerate(book_urls))
+
+    return pages
+
+
+async def fetch_books_async(start_url, concurrency=ASYNC_CONCURRENCY, host_delay=HOST_DELAY, genres="details"):
+    """The same records as fetch_books(start_url, engine="async"), for callers already in an event loop."""
+    pages = await crawl_async(start_url, concurrency, host_delay, genres)
+    return [book for _, books in pages for book in books]
+
+
+async def crawl_async(start_url, concurrency=ASYNC_CONCURRENCY, host_delay=HOST_DELAY, genres="details"):
+    """
+    fetch_books on asyncio + httpx: one keep-alive client, at most concurrency requests in
+    flight (one slot kept for listing pages), host_delay between request starts per host and
+    retries with exponential backoff. Parsing, caching and results match the threaded engine.
+    Returns (listing page URL, its books) in catalogue order.
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    detail_slots = asyncio.Semaphore(max(concurrency - 1, 1))
+    next_start = {}  # host -> earliest time the next request may start
+    host_locks = {}
+
+    async def polite_get(client, url):
+        """Like fetch_page: (bytes, changed), through the crawl cache when there is one."""
+        cached = cache_lookup(url)
+        if fresh_in_crawl(cached):
+            return cached[2], False
+        host = urlsplit(url).netloc
+        lock = host_locks.setdefault(host, asyncio.Lock())
+        for attempt in range(MAX_RETRIES + 1):
+            async with lock:
+                wait_for = next_start.get(host, 0) - time.monotonic()
+                if wait_for > 0:
+                    await asyncio.sleep(wait_for)
+                next_start[host] = time.monotonic() + host_delay
+            try:
+                response = await client.get(url, headers=revalidation_headers(cached))
+                if response.status_code == 304 and cached:
+                    cache_touch(url)
+                    return cached[2], False
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    response.raise_for_status()
+                    cache_store(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), response.content)
+                    return response.content, True
+            except httpx.TransportError:
+                if attempt == MAX_RETRIES:
+                    raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    async def add_genre(client, book, book_url, progress):
+        async with detail_slots:
+            try:
+                content, _ = await polite_get(client, book_url)
+                book["genre"] = await run_parser_async(genre_from_html, content)
+            except Exception:
+                book["genre"] = "Unknown"
+        progress.update()
+
+    async def checkpoint(page_url, books, details):
+        await asyncio.gather(*details)
+        save_page_books(page_url, books)
+
+    async def index_category(client, genre, url):
+        while url:
+            try:
+                async with detail_slots:
+                    content, _ = await polite_get(client, url)
+                _, book_urls, next_url = await run_parser_async(listing_from_html, content, url)
+            except Exception as e:
+                # Its books just miss the index and fall back to their own pages
+                tqdm.write(f"Couldn't index category {genre} ({url}): {e}")
+                return
+            for book_url in book_urls:
+                genre_index.setdefault(book_url, genre)
+            url = next_url
+
+    pages = []
+    checkpoints = []
+    genre_index = {}  # book URL -> genre, from the category listings (genres="index")
+    indexing = []
+    categories = []  # (genre, category URL) to index once a page actually needs genres
+    unresolved = []  # (page URL, books, book URLs) waiting for the category index
+    async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=30, follow_redirects=True) as client:
+        with tqdm(desc="Processing books", unit="book") as progress:
+            url = start_url
+            while url:
+                content, changed = await polite_get(client, url)
+                books, book_urls, next_url = await run_parser_async(listing_from_html, content, url)
+                if genres == "index" and not pages:
+                    categories = await run_parser_async(categories_from_html, content, url)
+                saved = None if changed else load_page_books(url, len(books))
+                tqdm.write(f"Scraped page {len(pages) + 1}: {url}" + (" (unchanged)" if saved else ""))
+                pages.append((url, saved or books))
+                progress.total = (progress.total or 0) + len(books)
+                progress.update(len(books) if saved else 0)
+                if not saved and genres == "index":
+                    # Index only when some page changed; a fully unchanged re-run skips it
+                    indexing.extend(asyncio.create_task(index_category(client, genre, category_url))
+                                    for genre, category_url in categories)
+                    categories = []
+                    unresolved.append((url, books, book_urls))
+                elif not saved:
+                    details = [asyncio.create_task(add_genre(client, book, book_url, progress))
+                               for book, book_url in zip(books, book_urls)]
+                    checkpoints.append(asyncio.create_task(checkpoint(url, books, details)))
+                url = next_url
+
+            # Join against the category index, fetching book pages only for misses
+            await asyncio.gather(*indexing)
+            for page_url, books, book_urls in unresolved:
+                details = []
+                for book, book_url in zip(books, book_urls):
+                    if book_url in genre_index:
+                        book["genre"] = genre_index[book_url]
+                        progress.update()
+                    else:
+                        details.append(asyncio.create_task(add_genre(client, book, book_url, progress)))
+                checkpoints.append(asyncio.create_task(checkpoint(page_url, books, details)))
+            await asyncio.gather(*checkpoints)
+
+    return pages
 
 
 def search_books(books, title=None, price=None, rating=None, genre=None):
@@ -103,8 +727,39 @@ def print_books(books):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape books.toscrape.com, then search the results")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="async uses asyncio + httpx with many more requests in flight")
+    parser.add_argument("--concurrency", type=int,
+                        help=f"requests in flight (default {CRAWL_CONCURRENCY} threads / {ASYNC_CONCURRENCY} async)")
+    parser.add_argument("--parse-workers", type=int, default=0, help="parse pages in this many processes")
+    parser.add_argument("--genres", choices=["details", "index"], default="details",
+                        help="index reads genres from the category listings instead of every book's page")
+    parser.add_argument("--benchmark-parsing", action="store_true", help="print pages parsed per second and exit")
+    parser.add_argument("--benchmark-crawl", metavar="LATENCY_MS", type=float, nargs="?", const=50,
+                        help="crawl a local mirror answering after LATENCY_MS (default 50) with each engine, print timings and exit")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-crawl even if books from a finished crawl are saved (only changed pages are downloaded)")
+    parser.add_argument("--no-cache", action="store_true", help=f"don't read or write {os.path.basename(CACHE_DB_PATH)}")
+    args = parser.parse_args()
+
+    if args.benchmark_parsing:
+        print(benchmark_parsing())
+        raise SystemExit
+
+    if args.benchmark_crawl is not None:
+        print(json.dumps(benchmark_crawl(args.benchmark_crawl / 1000, args.concurrency), indent=2))
+        raise SystemExit
+
     try:
-        books = fetch_books(BASE_URL)
+        books = None
+        if not args.refresh and not args.no_cache:
+            books, finished_at = load_saved_books(BASE_URL)
+        if books:
+            print(f"Loaded {len(books)} books saved {time.ctime(finished_at)} (--refresh to re-crawl)")
+        else:
+            books = fetch_books(BASE_URL, args.concurrency, args.engine, args.parse_workers, args.genres,
+                                cache_path=None if args.no_cache else CACHE_DB_PATH)
 
         print("\nBook Search Engine")
         print("Enter search criteria (leave blank to skip):")
@@ -1,28 +1,24 @@
-﻿from tkinterweb import HtmlFrame
-import threading
+﻿import threading
 import webbrowser
 import tkinter as tk
 from tkinter import ttk
-from geopy.geocoders import Nominatim
-import requests
-import json
 from datetime import datetime
-from PIL import Image, ImageTk
-import io
-from io import BytesIO
-import traceback
-from tkinter import messagebox
-import ttkthemes
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.dates as mdates
-
-geolocator = Nominatim(user_agent="(Logan Labinski, student, loganlabinski47@gmail.com)")
+import time
+import random
+from tkinter import messagebox, filedialog
+
+# Fetching, parsing and caching live in weather.py; this file is the Tk front end
+from weather import fetch_weather, format_time, normalize_address, load_snapshot, load_icons, hourly_columns, HOURLY_PAGE
+from weather import span, record_span, set_tracing, clear_trace, span_summary, export_trace
+from weather import poll_alerts, diff_alerts, load_snapshot_icons, save_snapshot
+from weather import query_observations, downsample, celsius_to_fahrenheit
 
 # Globals
 root = None
 entry = None
 output_label = None
+status_label = None
+alerts_frame = None
 location = None
 daily_forecast_table = None
 hourly_forecast_table = None
@@ -30,14 +26,70 @@ notebook = None
 radar_frame = None
 open_radar_btn = None
 graph_frame = None  # Add this line
+diagnostics_table = None
+
+# Keep references to icons so they aren’t garbage collected (icon URL -> PhotoImage)
+icon_cache = {}
+
+# What each table currently shows: row key (startTime) -> (values, icon URL, whether the icon is shown)
+table_rows = {"daily": {}, "hourly": {}}
+
+# Tk main-thread cost of the last table update, e.g. {"seconds": 0.004, "rows_changed": 3}
+ui_timings = {}
+
+# Temperature graph built once and updated in place: fig, ax, line, canvas, background, limits, pending
+temperature_graph = {}
 
-# Keep references to icons so they aren’t garbage collected
-icon_cache = {"daily": [], "hourly": []}
+# Graph render timings in seconds, e.g. {"build": 0.31, "draw": 0.002, "mode": "blit"}
+graph_timings = {}
 
 # Latest lat/lon (for radar button)
 latest_lat = None
 latest_lon = None
 
+# Archived observations (weather.py --ingest) of the station on screen, graphed too: (Unix times, °F).
+# Loaded by the fetch worker with its result so the Tk thread never reads the archive
+observed_series = ([], [])
+
+# Fetch scheduler (main thread only): one in-flight fetch per location, newest request wins
+AUTO_REFRESH_SECONDS = 10 * 60
+RETRY_BASE_SECONDS = 30  # first retry after a failed auto-refresh, doubled each failure
+MAX_BACKOFF_SECONDS = 60 * 60
+REFRESH_JITTER = 0.1  # +/-10% so several open windows don't poll in lockstep
+inflight_fetches = set()  # normalized addresses with a worker running
+wanted_key = None  # normalized address the UI wants to show; other results are stale
+wanted_address = None
+loaded_key = None  # last location shown successfully
+refresh_failures = 0
+refresh_after_id = None
+auto_refresh_var = None
+
+# Virtualized hourly table: the whole series as columns, but rows/icons only for the first "loaded" hours
+hourly_view = {"columns": None, "loaded": 0, "icons": {}, "loading": False}
+
+# Alert watcher: polls only /alerts/active between full refreshes and applies the deltas
+ALERT_POLL_SECONDS = 60
+shown_alerts = {}  # alert ID -> item currently shown
+alert_labels = {}  # alert ID -> tk.Label
+alert_poll_after_id = None
+
+# Main-thread stall detection: a heartbeat that should run every STALL_TICK_MS; lateness beyond
+# STALL_THRESHOLD_MS means Tk was blocked. Example: {"count": 2, "max_ms": 180.0, "total_ms": 260.0}
+STALL_TICK_MS = 50
+STALL_THRESHOLD_MS = 50
+stall_stats = {"count": 0, "max_ms": 0.0, "total_ms": 0.0}
+
+# When the data on screen was fetched (epoch seconds), for the staleness indicator
+shown_fetched_at = None
+status_error = None  # refresh error the status line is showing, if any
+STATUS_TICK_MS = 60 * 1000  # how often the "(N min ago)" age is redrawn
+
+# Startup timings in seconds, e.g. {"first_paint": 0.18} (saved snapshot on screen)
+startup_timings = {}
+
+# (forecast URL, hourly URL) currently shown in the tables, so unchanged data can skip the rebuild
+displayed_forecast_key = None
+
 # Theme definitions
 THEMES = {
     "Default": {
@@ -74,124 +126,107 @@ THEMES = {
     }
 }
 
-def safe_json(response):
-    try:
-        return response.json()
-    except Exception:
-        content = response.content
-        # Try response's declared encoding first if available
-        if response.encoding:
-            try:
-                text = content.decode(response.encoding)
-                return json.loads(text)
-            except Exception:
-                pass
-        # Then try our fallback encodings
-        for enc in ("utf-8", "utf-8-sig", "iso-8859-1", "latin-1", "cp1252"):
-            try:
-                text = content.decode(enc)
-                return json.loads(text)
-            except Exception:
-                continue
-        # Last resort: replace invalid characters
-        text = content.decode("utf-8", errors="replace")
-        return json.loads(text)
-
-
-def format_time(iso_str):
-    try:
-        dt = datetime.fromisoformat(iso_str)
-        return dt.strftime("%I %p").lstrip("0")
-    except Exception:
-        return iso_str
+# Widgets recolored by apply_theme, registered by role when they are created (see themed):
+# "text" (Label/Button: bg+fg), "entry" (Entry: field colors), "frame" and "alert" (bg only;
+# alerts keep their red text)
+themed_widgets = {"text": set(), "entry": set(), "frame": set(), "alert": set()}
 
+# theme name -> options built by theme_options; applied_theme_options is what is on screen now
+theme_option_cache = {}
+applied_theme_options = None
+
+
+def theme_options(theme_name):
+    """Every ttk style, style map and widget role option for a theme, built once per theme."""
+    if theme_name in theme_option_cache:
+        return theme_option_cache[theme_name]
+
+    theme = THEMES[theme_name]
+    tab_map = {
+        "background": [("selected", theme["select_bg"]), ("active", theme["bg"])],
+        "foreground": [("selected", theme["select_fg"]), ("active", theme["fg"])],
+    }
+    options = {
+        "root": {"bg": theme["bg"]},
+        "styles": {
+            # Custom tab style for Notebook
+            "CustomNotebook.Tab": {"background": theme["bg"], "foreground": theme["fg"],
+                                   "padding": [10, 2], "font": ('TkDefaultFont', 10, 'bold')},
+            "TNotebook": {"background": theme["bg"], "borderwidth": 0},
+            "TNotebook.Tab": {"background": theme["bg"], "foreground": theme["fg"]},
+            "TFrame": {"background": theme["bg"]},
+            # Treeview rows are styled here, so table size never matters
+            "Treeview": {"background": theme["tree_bg"], "foreground": theme["tree_fg"], "fieldbackground": theme["tree_bg"]},
+            "Treeview.Heading": {"background": theme["bg"], "foreground": theme["fg"]},
+        },
+        "maps": {
+            "CustomNotebook.Tab": tab_map,
+            "TNotebook.Tab": tab_map,
+            "Treeview": {"background": [("selected", theme["select_bg"])],
+                         "foreground": [("selected", theme["select_fg"])]},
+        },
+        "roles": {
+            "text": {"bg": theme["bg"], "fg": theme["fg"]},
+            "entry": {"bg": theme["tree_bg"], "fg": theme["tree_fg"]},
+            "frame": {"bg": theme["bg"]},
+            "alert": {"bg": theme["bg"]},
+        },
+    }
+    theme_option_cache[theme_name] = options
+    return options
 
-def download_icon_bytes(url, timeout=10):
-    """Return raw bytes of icon or None on failure."""
-    if not url:
-        return None
-    try:
-        r = requests.get(url, timeout=timeout)
-        r.raise_for_status()
-        return r.content
-    except Exception:
-        return None
+
+def changed_options(old, new):
+    """The options in new whose values differ from old."""
+    return {name: value for name, value in new.items() if old.get(name) != value}
 
 
 def apply_theme(theme_name):
+    """Switch themes, reconfiguring only the styles and registered widgets whose options change."""
+    global applied_theme_options
     if theme_name not in THEMES:
         return
 
-    theme = THEMES[theme_name]
-
-    root.configure(bg=theme["bg"])
-
+    options = theme_options(theme_name)
+    previous = applied_theme_options
     style = ttk.Style()
-    style.theme_use('default')  # Ensure the default theme is used
-
-    # Custom tab style for Notebook
-    style.configure("CustomNotebook.Tab",
-                    background=theme["bg"],
-                    foreground=theme["fg"],
-                    padding=[10, 2],
-                    font=('TkDefaultFont', 10, 'bold'))
-    style.map("CustomNotebook.Tab",
-              background=[("selected", theme["select_bg"]), ("active", theme["bg"])],
-              foreground=[("selected", theme["select_fg"]), ("active", theme["fg"])])
-    
-    # Apply the custom tab style to the Notebook
-    style.configure("TNotebook", background=theme["bg"], borderwidth=0)
-    style.configure("TNotebook.Tab", background=theme["bg"], foreground=theme["fg"])
-    style.map("TNotebook.Tab",
-              background=[("selected", theme["select_bg"]), ("active", theme["bg"])],
-              foreground=[("selected", theme["select_fg"]), ("active", theme["fg"])])
-    
-    # Frame backgrounds
-    style.configure("TFrame", background=theme["bg"])
-
-    # Treeview
-    style.configure("Treeview",
-                    background=theme["tree_bg"],
-                    foreground=theme["tree_fg"],
-                    fieldbackground=theme["tree_bg"])
-    style.map("Treeview",
-              background=[("selected", theme["select_bg"])],
-              foreground=[("selected", theme["select_fg"])])
-    
-    style.configure("Treeview.Heading",
-                    background=theme["bg"],
-                    foreground=theme["fg"])
-
-    # Update all direct children widgets
-    for widget in root.winfo_children():
-        if isinstance(widget, tk.Label):
-            widget.configure(bg=theme["bg"], fg=theme["fg"])
-        elif isinstance(widget, tk.Frame):
-            widget.configure(bg=theme["bg"])
-            for child in widget.winfo_children():
-                if isinstance(child, tk.Label):
-                    child.configure(bg=theme["bg"], fg=theme["fg"])
-                elif isinstance(child, tk.Entry):
-                    child.configure(bg=theme["tree_bg"], fg=theme["tree_fg"])
-                elif isinstance(child, tk.Button):
-                    child.configure(bg=theme["bg"], fg=theme["fg"])
-        elif isinstance(widget, ttk.Notebook):
-            widget.configure(style="TNotebook")
-            for i in range(widget.index("end")):
-                tab_frame = widget.nametowidget(widget.tabs()[i])
-                tab_frame.configure(style="TFrame")
-                for child in tab_frame.winfo_children():
-                    if isinstance(child, tk.Label):
-                        child.configure(bg=theme["bg"], fg=theme["fg"])
-                    elif isinstance(child, tk.Button):
-                        child.configure(bg=theme["bg"], fg=theme["fg"])
-
+    if previous is None:
+        style.theme_use('default')  # Ensure the default theme is used
+        previous = {"root": {}, "styles": {}, "maps": {}, "roles": {}}
+
+    changed = changed_options(previous["root"], options["root"])
+    if changed:
+        root.configure(**changed)
+    for name, style_options in options["styles"].items():
+        changed = changed_options(previous["styles"].get(name, {}), style_options)
+        if changed:
+            style.configure(name, **changed)
+    for name, style_map in options["maps"].items():
+        changed = changed_options(previous["maps"].get(name, {}), style_map)
+        if changed:
+            style.map(name, **changed)
+    for role, role_options in options["roles"].items():
+        changed = changed_options(previous["roles"].get(role, {}), role_options)
+        if changed:
+            for widget in themed_widgets[role]:
+                widget.configure(**changed)
+
+    applied_theme_options = options
     root.current_theme = theme_name
 
 
+def themed(widget, role):
+    """Register widget for theme switches under role, colour it for the current theme, and return it."""
+    themed_widgets[role].add(widget)
+    if applied_theme_options is not None:
+        widget.configure(**applied_theme_options["roles"][role])
+    return widget
+
+
 def main():
-    global root, entry, output_label, daily_forecast_table, hourly_forecast_table, notebook, radar_frame, open_radar_btn, graph_frame
+    global root, entry, output_label, status_label, alerts_frame, daily_forecast_table, hourly_forecast_table, notebook, radar_frame, open_radar_btn, graph_frame, auto_refresh_var
 
+    startup_start = time.perf_counter()
     root = tk.Tk()
     root.title("Weather by Address")
     root.geometry("1000x700")
@@ -214,29 +249,47 @@ def main():
     # Store current theme
     root.current_theme = "Default"
 
-    label = tk.Label(root, text="Enter an address, city, or state within the United States:")
+    # Options menu: periodic auto-refresh of the current location
+    options_menu = tk.Menu(menubar, tearoff=0)
+    menubar.add_cascade(label="Options", menu=options_menu)
+    auto_refresh_var = tk.BooleanVar(value=True)
+    options_menu.add_checkbutton(
+        label="Auto-refresh",
+        variable=auto_refresh_var,
+        command=lambda: schedule_auto_refresh(AUTO_REFRESH_SECONDS) if auto_refresh_var.get() and loaded_key else cancel_auto_refresh()
+    )
+
+    label = themed(tk.Label(root, text="Enter an address, city, or state within the United States:"), "text")
     label.pack(pady=5)
 
     entry = tk.Entry(root, width=60)
     entry.pack(pady=5)
 
     # Use a frame for the top row so we can add an "Enter" binding easily
-    top_frame = tk.Frame(root)
+    top_frame = themed(tk.Frame(root), "frame")
     top_frame.pack(pady=2)
     # Move the entry into top_frame
     entry.pack_forget()
-    entry = tk.Entry(top_frame, width=52)
+    entry = themed(tk.Entry(top_frame, width=52), "entry")
     entry.pack(side="left", padx=(0, 6))
-    # Button launches a worker thread so UI doesn't block
-    button = tk.Button(top_frame, text="Get Weather", command=lambda: threading.Thread(target=fetch_and_update_weather, daemon=True).start())
+    # Button asks the fetch scheduler, which runs the work on a worker thread so UI doesn't block
+    button = themed(tk.Button(top_frame, text="Get Weather", command=request_fetch), "text")
     button.pack(side="left")
 
     # Allow pressing Enter to trigger the same
-    entry.bind("<Return>", lambda e: threading.Thread(target=fetch_and_update_weather, daemon=True).start())
+    entry.bind("<Return>", lambda e: request_fetch())
 
-    output_label = tk.Label(root, text="", justify="center")
+    output_label = themed(tk.Label(root, text="", justify="center"), "text")
     output_label.pack(pady=8, fill="x", padx=6, anchor="center")
 
+    # Shows how old the data on screen is, and whether the last refresh failed
+    status_label = themed(tk.Label(root, text="", justify="center"), "text")
+    status_label.pack(fill="x", padx=6)
+
+    # One label per active alert, added/updated/removed individually by the alert watcher
+    alerts_frame = themed(tk.Frame(root), "frame")
+    alerts_frame.pack(fill="x", padx=6)
+
     notebook = ttk.Notebook(root, style="TNotebook")
     notebook.pack(pady=10, fill="both", expand=True)
 
@@ -275,9 +328,14 @@ def main():
     hourly_forecast_table.heading("Time", text="Time")
     hourly_forecast_table.heading("Forecast", text="Forecast")
     hourly_forecast_table.heading("Temp", text="Temp")
-    hourly_forecast_table.column("Time", width=100, anchor="w")
+    hourly_forecast_table.column("Time", width=110, anchor="w")
     hourly_forecast_table.column("Forecast", width=500, anchor="w")
     hourly_forecast_table.column("Temp", width=80, anchor="center")
+
+    # The scrollbar also tells us when to build the next page of hourly rows
+    hourly_scroll = ttk.Scrollbar(hourly_frame, orient="vertical", command=hourly_forecast_table.yview)
+    hourly_forecast_table.configure(yscrollcommand=lambda first, last: on_hourly_scroll(hourly_scroll, first, last))
+    hourly_scroll.pack(side="right", fill="y", pady=10)
     hourly_forecast_table.pack(pady=10, fill="both", expand=True)
 
     # Radar map tab (non-blocking): open RainViewer in browser
@@ -285,16 +343,24 @@ def main():
     notebook.add(radar_frame, text="Radar Map")
 
     # Radar tab contents: short description + button to open interactive map in web browser
-    radar_desc = tk.Label(radar_frame, text="Interactive radar is opened in your web browser. Center it on the current location using the button below.", wraplength=800, justify="left")
+    radar_desc = themed(tk.Label(radar_frame, text="Interactive radar is opened in your web browser. Center it on the current location using the button below.", wraplength=800, justify="left"), "text")
     radar_desc.pack(pady=(12, 6), padx=10)
 
-    open_radar_btn = tk.Button(radar_frame, text="Open Interactive Radar in Browser", state="disabled", command=lambda: open_rainviewer(lat=latest_lat, lon=latest_lon))
+    open_radar_btn = themed(tk.Button(radar_frame, text="Open Interactive Radar in Browser", state="disabled", command=lambda: open_rainviewer(lat=latest_lat, lon=latest_lon)), "text")
     open_radar_btn.pack(pady=6)
 
     # Temperature Graph tab
     graph_frame = ttk.Frame(notebook)
     notebook.add(graph_frame, text="Temperature Graph")
 
+    # Diagnostics tab: where refresh time goes, per pipeline stage
+    diagnostics_frame = ttk.Frame(notebook)
+    notebook.add(diagnostics_frame, text="Diagnostics")
+    build_diagnostics_panel(diagnostics_frame)
+
+    # The graph only redraws while visible, so catch up when its tab is selected (same for diagnostics)
+    notebook.bind("<<NotebookTabChanged>>", lambda e: on_tab_changed(diagnostics_frame))
+
     # Small helper: open RainViewer for the given lat/lon
     def open_rainviewer(lat=None, lon=None):
         if not lat or not lon:
@@ -308,188 +374,311 @@ def main():
     
     # Apply default theme at startup
     apply_theme("Default")
+
+    # Warm start: paint the last saved snapshot right away (icons follow from a worker thread),
+    # then refresh it in the background
+    snapshot = load_snapshot(load_images=False)
+    if snapshot:
+        entry.insert(0, snapshot["address"])
+        show_result(normalize_address(snapshot["address"]), snapshot)
+        root.update()
+        painted = time.perf_counter()
+        startup_timings["first_paint"] = painted - startup_start
+        record_span("startup.first_paint", startup_start, painted)
+        threading.Thread(target=load_snapshot_icons_worker, args=(snapshot,), daemon=True).start()
+        request_fetch(snapshot["address"], auto=True)
+
+    stall_heartbeat(time.perf_counter())
+    root.after(STATUS_TICK_MS, status_tick)
     
     root.mainloop()
 
 
-def fetch_and_update_weather():
+def load_snapshot_icons_worker(snapshot):
+    """Worker thread: decode the warm-start snapshot's icons, then show them unless live data replaced it."""
+    load_snapshot_icons(snapshot)
+    snapshot["observed_history"] = observed_history(snapshot["station_id"])
+
+    def finish():
+        if shown_fetched_at == snapshot["fetched_at"]:
+            show_result(normalize_address(snapshot["address"]), snapshot)
+
+    root.after(0, finish)
+
+
+def stall_heartbeat(expected):
+    """Reschedules itself every STALL_TICK_MS and records how late it ran (time Tk spent blocked)."""
+    now = time.perf_counter()
+    late_ms = (now - expected) * 1000
+    if late_ms > STALL_THRESHOLD_MS:
+        stall_stats["count"] += 1
+        stall_stats["total_ms"] += late_ms
+        stall_stats["max_ms"] = max(stall_stats["max_ms"], late_ms)
+        record_span("tk.stall", expected, now)
+    # The deadline is fixed now, when the next tick is scheduled, not when it finally runs
+    root.after(STALL_TICK_MS, stall_heartbeat, now + STALL_TICK_MS / 1000)
+
+
+def on_tab_changed(diagnostics_frame):
+    if graph_tab_visible():
+        draw_temperature_graph()
+    elif notebook.select() == str(diagnostics_frame):
+        refresh_diagnostics()
+
+
+def build_diagnostics_panel(frame):
+    """Tracing controls plus a table of per-stage span totals."""
+    global diagnostics_table
+
+    controls = tk.Frame(frame)
+    controls.pack(fill="x", padx=10, pady=(10, 0))
+
+    tracing_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(controls, text="Record timings", variable=tracing_var,
+                   command=lambda: set_tracing(tracing_var.get())).pack(side="left")
+    tk.Button(controls, text="Refresh", command=refresh_diagnostics).pack(side="left", padx=4)
+    tk.Button(controls, text="Clear", command=lambda: (clear_trace(), refresh_diagnostics())).pack(side="left", padx=4)
+    tk.Button(controls, text="Export Chrome Trace...", command=export_diagnostics).pack(side="left", padx=4)
+
+    diagnostics_table = ttk.Treeview(frame, columns=("Count", "Total", "Max"), show="tree headings", height=15)
+    diagnostics_table.heading("#0", text="Stage")
+    diagnostics_table.column("#0", width=220, anchor="w")
+    diagnostics_table.heading("Count", text="Count")
+    diagnostics_table.heading("Total", text="Total (ms)")
+    diagnostics_table.heading("Max", text="Max (ms)")
+    diagnostics_table.column("Count", width=80, anchor="center")
+    diagnostics_table.column("Total", width=120, anchor="e")
+    diagnostics_table.column("Max", width=120, anchor="e")
+    diagnostics_table.pack(pady=10, padx=10, fill="both", expand=True)
+
+
+def refresh_diagnostics():
+    diagnostics_table.delete(*diagnostics_table.get_children())
+    for name, count, total_ms, max_ms in span_summary():
+        diagnostics_table.insert("", "end", text=name, values=(count, f"{total_ms:.1f}", f"{max_ms:.1f}"))
+    # Stalls are counted even while span recording is off
+    diagnostics_table.insert("", "end", text="Tk main-thread stalls (all time)",
+                             values=(stall_stats["count"], f"{stall_stats['total_ms']:.1f}", f"{stall_stats['max_ms']:.1f}"))
+    if "first_paint" in startup_timings:
+        first_paint_ms = startup_timings["first_paint"] * 1000
+        diagnostics_table.insert("", "end", text="Startup to first paint (snapshot)",
+                                 values=(1, f"{first_paint_ms:.1f}", f"{first_paint_ms:.1f}"))
+
+
+def export_diagnostics():
+    path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")], initialfile="weather_trace.json")
+    if path:
+        export_trace(path)
+
+
+def request_fetch(address=None, auto=False):
     """
-    Worker thread: performs geocoding and NWS network calls and downloads icon bytes.
-    Posts results back to the main thread using root.after(...)
+    Main thread: ask for weather for address (default: the entry box).
+    Duplicate requests for a location already being fetched are coalesced,
+    and asking for a new location makes any older in-flight result stale.
     """
-    global latest_lat, latest_lon
+    global wanted_key, wanted_address, refresh_failures
 
-    # Show loading message immediately
-    root.after(0, lambda: output_label.config(text="Loading..."))
-
-    address = entry.get().strip()
+    if address is None:
+        address = entry.get().strip()
     if not address:
-        root.after(0, lambda: output_label.config(text="Please enter an address."))
+        output_label.config(text="Please enter an address.")
         return
 
-    try:
-        # Geocode (this is blocking — but in worker thread that's okay)
-        loc = geolocator.geocode(address, timeout=10)
-    except Exception as e:
-        err = f"Geocoding error: {e}"
-        root.after(0, lambda: output_label.config(text=err))
-        return
+    key = normalize_address(address)
+    if key != wanted_key:
+        refresh_failures = 0
+    wanted_key, wanted_address = key, address
+    cancel_auto_refresh()
 
-    if not loc:
-        root.after(0, lambda: output_label.config(text="Address not found."))
+    if not auto:
+        # Show loading message immediately
+        output_label.config(text="Loading...")
+    if key in inflight_fetches:
         return
+    inflight_fetches.add(key)
+    threading.Thread(target=fetch_worker, args=(address, key), daemon=True).start()
 
-    lat = loc.latitude
-    lon = loc.longitude
-    latest_lat, latest_lon = lat, lon
 
-    headers = {"User-Agent": "Logan Labinski (loganlabinski47@gmail.com)"}
+def fetch_worker(address, key):
+    """
+    Worker thread: runs fetch_weather and posts the result back to the main thread using root.after(...)
+    """
+    result = fetch_weather(address)
+    if not result["error"]:
+        save_snapshot(result)  # warm start for the next launch
+        result["observed_history"] = observed_history(result["station_id"])
+    root.after(0, lambda: apply_fetch_result(key, result))
+
 
-    try:
-        # single /points call
-        points_url = f"https://api.weather.gov/points/{lat},{lon}"
-        points_response = requests.get(points_url, headers=headers, timeout=15)
-        points_data = safe_json(points_response)
-
-        # Stations -> station id -> latest obs
-        stations_url = points_data["properties"]["observationStations"]
-        stations_response = requests.get(stations_url, headers=headers, timeout=15)
-        stations_data = safe_json(stations_response)
-        station_id = stations_data["features"][0]["properties"]["stationIdentifier"]
-
-        latest_obs_url = f"https://api.weather.gov/stations/{station_id}/observations/latest"
-        obs_response = requests.get(latest_obs_url, headers=headers, timeout=15)
-        obs_data = safe_json(obs_response)
-
-        # forecast (daily) and hourly
-        forecast_url = points_data["properties"].get("forecast")
-        if forecast_url:
-            forecast_response = requests.get(forecast_url, headers=headers, timeout=15)
-            forecast_data = safe_json(forecast_response)
-            periods = forecast_data.get("properties", {}).get("periods", [])
-        else:
-            periods = []
+def apply_fetch_result(key, result):
+    """Main thread: show a finished fetch unless a newer request superseded it, then schedule the next refresh."""
+    global refresh_failures, loaded_key
+
+    inflight_fetches.discard(key)
+    if key != wanted_key:
+        return
 
-        forecast_hourly_url = points_data["properties"].get("forecastHourly")
-        if forecast_hourly_url:
-            hourly_response = requests.get(forecast_hourly_url, headers=headers, timeout=15)
-            hourly_data = safe_json(hourly_response)
-            hourly_periods = hourly_data.get("properties", {}).get("periods", [])
+    if result["error"]:
+        # Only retry locations that have loaded before (not typos or unknown addresses)
+        if key == loaded_key:
+            # Keep the data on screen and flag it as stale instead of replacing it with the error
+            update_status(result["error"])
+            refresh_failures += 1
+            schedule_auto_refresh(min(RETRY_BASE_SECONDS * 2 ** (refresh_failures - 1), MAX_BACKOFF_SECONDS))
         else:
-            hourly_periods = []
-
-        # Download icon bytes for each period (so we can create PhotoImage on main thread)
-        daily_icon_bytes = []
-        for p in periods:
-            icon_url = p.get("icon")
-            daily_icon_bytes.append(download_icon_bytes(icon_url))
-
-        hourly_icon_bytes = []
-        for p in hourly_periods[:24]:
-            icon_url = p.get("icon")
-            hourly_icon_bytes.append(download_icon_bytes(icon_url))
-
-        # --- NEW: Fetch alerts ---
-        alerts_url = f"https://api.weather.gov/alerts/active?point={lat},{lon}"
-        alerts_response = requests.get(alerts_url, headers=headers, timeout=15)
-        alerts_data = safe_json(alerts_response)
-        alerts = alerts_data.get("features", [])
-        alert_messages = []
-        for alert in alerts:
-            headline = alert.get("properties", {}).get("headline")
-            if headline:
-                alert_messages.append(headline)
-    except Exception as e:
-        tb = traceback.format_exc()
-        root.after(0, lambda: output_label.config(text=f"Network/API error: {e}\n{tb.splitlines()[-1]}"))
+            output_label.config(text=result["error"])
         return
 
-    # Build current conditions text (done here so worker thread doesn't need to touch UI)
-    try:
-        props = obs_data.get("properties", {})
+    refresh_failures = 0
+    show_result(key, result)
+    schedule_auto_refresh(AUTO_REFRESH_SECONDS)
+
+
+def show_result(key, result):
+    """Main thread: put a fetch_weather result (live or saved snapshot) on screen."""
+    global loaded_key, shown_fetched_at, observed_series
+
+    loaded_key = key
+    shown_fetched_at = result["fetched_at"]
+    observed_series = result.get("observed_history", ([], []))
+    # Now update UI (create PhotoImage objects here on the main thread)
+    with span("ui.update"):
+        update_ui_with_fetched(
+            result["current_text"], result["periods"], result["hourly_periods"],
+            result["daily_icons"], result["hourly_icons"], result["lat"], result["lon"],
+            result["forecast_key"], result["forecast_changed"])
+    apply_alert_items(result["alert_items"])
+    schedule_alert_poll()
+    update_status()
+
+
+def apply_alert_items(items):
+    """Main thread: show items (alert ID -> item), touching only alerts that are new, changed or expired."""
+    added, updated, expired = diff_alerts(shown_alerts, items)
+    for alert_id in expired:
+        label = alert_labels.pop(alert_id)
+        themed_widgets["alert"].discard(label)
+        label.destroy()
+        del shown_alerts[alert_id]
+    for alert_id in updated:
+        alert_labels[alert_id].config(text=f"\u26a0 {items[alert_id]['headline']}")
+        shown_alerts[alert_id] = items[alert_id]
+    for alert_id in added:
+        label = themed(tk.Label(alerts_frame, text=f"\u26a0 {items[alert_id]['headline']}", fg="#C62828", justify="left", wraplength=900), "alert")
+        label.pack(anchor="w")
+        alert_labels[alert_id] = label
+        shown_alerts[alert_id] = items[alert_id]
+    return len(added) + len(updated) + len(expired)
+
+
+def schedule_alert_poll():
+    global alert_poll_after_id
+    if alert_poll_after_id is not None:
+        root.after_cancel(alert_poll_after_id)
+    alert_poll_after_id = root.after(ALERT_POLL_SECONDS * 1000, poll_alerts_now)
+
+
+def poll_alerts_now():
+    """Poll the alerts endpoint for the location on screen on a worker thread, then apply any changes."""
+    global alert_poll_after_id
+    alert_poll_after_id = None
+    key, lat, lon = loaded_key, latest_lat, latest_lon
+    if key is None or lat is None:
+        return
 
-        temp_c = props.get("temperature", {}).get("value")
-        temp_f = temp_c * 9 / 5 + 32 if temp_c is not None else None
-        text_desc = props.get("textDescription", "N/A")
+    def work():
+        try:
+            items, changed = poll_alerts(lat, lon)
+        except Exception:
+            items, changed = None, False
+        root.after(0, lambda: finish(items, changed))
 
-        humidity = props.get("relativeHumidity", {}).get("value")
-        pressure = props.get("barometricPressure", {}).get("value")
-        visibility = props.get("visibility", {}).get("value")
-        
-        # Add wind speed data
-        wind_speed = props.get("windSpeed", {}).get("value")
-        wind_direction = props.get("windDirection", {}).get("value")
-        
-        feels_like_c = props.get("heatIndex", {}).get("value") or props.get("windChill", {}).get("value")
-        feels_like_f = feels_like_c * 9 / 5 + 32 if feels_like_c is not None else None
+    def finish(items, changed):
+        # A full refresh or a new location may have taken over in the meantime
+        if key != loaded_key or alert_poll_after_id is not None:
+            return
+        if changed and items is not None:
+            with span("ui.alerts"):
+                apply_alert_items(items)
+        schedule_alert_poll()
 
-        text_lines = [f"Current conditions at {station_id}:"]
-        if temp_f is not None:
-            text_lines.append(f"Temperature: {temp_f:.1f}\N{DEGREE SIGN}F")
-        else:
-            text_lines.append("Temperature: Not available")
-        if feels_like_f is not None:
-            text_lines.append(f"Feels Like: {feels_like_f:.1f}\N{DEGREE SIGN}F")
-
-        text_lines.append(f"Conditions: {text_desc}")
-
-        # Add wind information
-        if wind_speed is not None:
-            try:
-                wind_speed_mph = wind_speed * 2.237  # Convert m/s to mph
-                direction_text = ""
-                if wind_direction is not None:
-                    direction_text = f" from {wind_direction}\N{DEGREE SIGN}"
-                text_lines.append(f"Wind: {wind_speed_mph:.1f} mph{direction_text}")
-            except Exception:
-                text_lines.append(f"Wind: {wind_speed}")
-
-        if humidity is not None:
-            try:
-                text_lines.append(f"Humidity: {humidity:.0f}%")
-            except Exception:
-                text_lines.append(f"Humidity: {humidity}")
-        if pressure is not None:
-            try:
-                text_lines.append(f"Pressure: {pressure/100:.1f} hPa")
-            except Exception:
-                text_lines.append(f"Pressure: {pressure}")
-        if visibility is not None:
-            try:
-                text_lines.append(f"Visibility: {visibility/1000:.1f} km")
-            except Exception:
-                text_lines.append(f"Visibility: {visibility}")
-
-        # --- NEW: Add alerts to output ---
-        if alert_messages:
-            text_lines.append("\n⚠ Extreme Weather Alerts:")
-            for msg in alert_messages:
-                text_lines.append(f"- {msg}")
-
-        current_text = "\n".join(text_lines)
-    except Exception as e:
-        current_text = f"Error building current conditions: {e}"
-
-    # Now post updates to the main thread to update UI (create PhotoImage objects there)
-    root.after(0, lambda: update_ui_with_fetched(current_text, periods, hourly_periods, daily_icon_bytes, hourly_icon_bytes, lat, lon))
-
-
-def update_ui_with_fetched(current_text, periods, hourly_periods, daily_icon_bytes, hourly_icon_bytes, lat, lon):
+    threading.Thread(target=work, daemon=True).start()
+
+
+def update_status(error=None):
+    """Show when the data on screen was fetched; with error, mark it as stale."""
+    global status_error
+    status_error = error
+    if shown_fetched_at is None:
+        status_label.config(text="")
+        return
+    fetched = datetime.fromtimestamp(shown_fetched_at)
+    minutes = int((time.time() - shown_fetched_at) // 60)
+    if minutes < 1:
+        age = "just now"
+    elif minutes < 120:
+        age = f"{minutes} min ago"
+    else:
+        age = f"{minutes // 60} h ago"
+    when = fetched.strftime("%b %d %I:%M %p")
+    if error:
+        status_label.config(text=f"Offline or refresh failed \N{EM DASH} showing data from {when} ({age})\n{error.splitlines()[0]}")
+    else:
+        status_label.config(text=f"Updated {when} ({age})")
+
+
+def status_tick():
+    """Redraw the status line every STATUS_TICK_MS so its age keeps counting up between fetches."""
+    update_status(status_error)
+    root.after(STATUS_TICK_MS, status_tick)
+
+
+def schedule_auto_refresh(seconds):
+    """Refresh wanted_address again after about seconds (with jitter), if auto-refresh is on."""
+    global refresh_after_id
+    cancel_auto_refresh()
+    if auto_refresh_var is None or not auto_refresh_var.get():
+        return
+    delay = seconds * random.uniform(1 - REFRESH_JITTER, 1 + REFRESH_JITTER)
+    refresh_after_id = root.after(int(delay * 1000), lambda: request_fetch(wanted_address, auto=True))
+
+
+def cancel_auto_refresh():
+    global refresh_after_id
+    if refresh_after_id is not None:
+        root.after_cancel(refresh_after_id)
+        refresh_after_id = None
+
+
+def update_ui_with_fetched(current_text, periods, hourly_periods, daily_icons, hourly_icons, lat, lon, forecast_key=None, forecast_changed=True):
     """
-    Run in main Tk thread: update labels and Treeviews, create PhotoImage objects from bytes.
+    Run in main Tk thread: update labels and Treeviews, create PhotoImage objects from decoded icons.
+    The tables and graph are left alone when the forecast is unchanged (304) for the location already shown.
     """
-    global icon_cache, latest_lat, latest_lon, open_radar_btn
+    global latest_lat, latest_lon, open_radar_btn, displayed_forecast_key
 
     latest_lat, latest_lon = lat, lon
 
     # Update current conditions label
     output_label.config(text=current_text)
 
-    # ------- Daily -------
-    for row in daily_forecast_table.get_children():
-        daily_forecast_table.delete(row)
-    icon_cache["daily"].clear()
+    # ------- Enable radar button now that we have lat/lon -------
+    try:
+        if open_radar_btn:
+            # Reconfigure the button to have a working command bound to the current lat/lon
+            open_radar_btn.config(state="normal", command=lambda lat=lat, lon=lon: webbrowser.open_new_tab(f"https://www.rainviewer.com/map.html?loc={lat},{lon},7&oFa=1&oC=1&oU=1&oMC=1&rmt=1&c=1&sm=1&sn=1"))
+    except Exception:
+        pass
+
+    if not forecast_changed and forecast_key is not None and forecast_key == displayed_forecast_key:
+        return
+    displayed_forecast_key = forecast_key
 
+    table_start = time.perf_counter()
+
+    # ------- Daily -------
+    daily_rows = []
     for idx, p in enumerate(periods):
         period_name = p.get("name", "")
         short_forecast = p.get("shortForecast", "")
@@ -500,80 +689,165 @@ def update_ui_with_fetched(current_text, periods, hourly_periods, daily_icon_byt
         if prob_precip is not None and prob_precip > 0:
             short_forecast = f"{short_forecast} ({prob_precip}% chance of precipitation)"
 
-        img_bytes = daily_icon_bytes[idx] if idx < len(daily_icon_bytes) else None
-        photo = None
-        if img_bytes:
-            try:
-                pil_im = Image.open(BytesIO(img_bytes)).convert("RGBA")
-                pil_im = pil_im.resize((32, 32), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(pil_im)
-            except Exception:
-                photo = None
-        icon_cache["daily"].append(photo)
-        # Insert with image into #0 (tree) column
-        daily_forecast_table.insert("", "end", text="", image=photo, values=(period_name, short_forecast, temp))
+        pil_im = daily_icons[idx] if idx < len(daily_icons) else None
+        daily_rows.append((p.get("startTime") or str(idx), (period_name, short_forecast, temp), p.get("icon"), pil_im))
+    rows_changed = sync_table(daily_forecast_table, "daily", daily_rows)
 
     # ------- Hourly -------
-    for row in hourly_forecast_table.get_children():
-        hourly_forecast_table.delete(row)
-    icon_cache["hourly"].clear()
+    # Keep the whole week as columns; only the first page gets rows, the rest load on scroll
+    columns = hourly_columns(hourly_periods)
+    hourly_view["columns"] = columns
+    hourly_view["icons"] = {url: im for url, im in zip(columns["icon"], hourly_icons) if im is not None}
+    hourly_view["loaded"] = min(HOURLY_PAGE, len(columns["startTime"]))
+    hourly_view["loading"] = False
+    rows_changed += sync_table(hourly_forecast_table, "hourly", hourly_rows(0, hourly_view["loaded"]))
+
+    # Drop PhotoImages no row refers to any more
+    in_use = {url for rows in table_rows.values() for _, url, _ in rows.values()}
+    for url in list(icon_cache):
+        if url not in in_use:
+            del icon_cache[url]
+
+    ui_timings["seconds"] = time.perf_counter() - table_start
+    record_span("ui.tables", table_start, table_start + ui_timings["seconds"])
+    ui_timings["rows_changed"] = rows_changed
 
-    for idx, p in enumerate(hourly_periods[:24]):
-        display_time = format_time(p.get("startTime", ""))
-        short_forecast = p.get("shortForecast", "")
-        temp = f"{p.get('temperature', '')}\N{DEGREE SIGN}{p.get('temperatureUnit', '')}"
+    # ------- Update temperature graph -------
+    with span("graph.update"):
+        update_temperature_graph(graph_frame, hourly_periods)
+
+
+def hourly_rows(start, stop):
+    """sync_table rows for hours start..stop of the hourly columns."""
+    columns = hourly_view["columns"]
+    rows = []
+    for idx in range(start, stop):
+        start_time = columns["startTime"][idx]
+        temp = columns["temperature"][idx]
+        short_forecast = columns["shortForecast"][idx]
+        prob_precip = columns["precip"][idx]
+
+        display_time = format_time(start_time)
+        try:
+            display_time = f"{datetime.fromisoformat(start_time):%a} {display_time}"
+        except ValueError:
+            pass
+        temp_text = "" if temp != temp else f"{temp:g}"  # NaN means missing
 
         # Add precipitation probability if available
-        prob_precip = p.get("probabilityOfPrecipitation", {}).get("value")
-        if prob_precip is not None and prob_precip > 0:
-            short_forecast = f"{short_forecast} ({prob_precip}% chance of precipitation)"
+        if prob_precip == prob_precip and prob_precip > 0:
+            short_forecast = f"{short_forecast} ({prob_precip:g}% chance of precipitation)"
 
-        img_bytes = hourly_icon_bytes[idx] if idx < len(hourly_icon_bytes) else None
-        photo = None
-        if img_bytes:
-            try:
-                pil_im = Image.open(BytesIO(img_bytes)).convert("RGBA")
-                pil_im = pil_im.resize((32, 32), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(pil_im)
-            except Exception:
-                photo = None
-        icon_cache["hourly"].append(photo)
-        hourly_forecast_table.insert("", "end", text="", image=photo, values=(display_time, short_forecast, temp))
+        url = columns["icon"][idx]
+        rows.append((start_time or str(idx), (display_time, short_forecast, f"{temp_text}\N{DEGREE SIGN}{columns['temperatureUnit'][idx]}"),
+                     url, hourly_view["icons"].get(url)))
+    return rows
 
-    # ------- Enable radar button now that we have lat/lon -------
-    try:
-        if open_radar_btn:
-            # Reconfigure the button to have a working command bound to the current lat/lon
-            open_radar_btn.config(state="normal", command=lambda lat=lat, lon=lon: webbrowser.open_new_tab(f"https://www.rainviewer.com/map.html?loc={lat},{lon},7&oFa=1&oC=1&oU=1&oMC=1&rmt=1&c=1&sm=1&sn=1"))
-    except Exception:
-        pass
 
-    # ------- Update temperature graph -------
-    update_temperature_graph(graph_frame, hourly_periods)
+def on_hourly_scroll(scrollbar, first, last):
+    """Treeview yscrollcommand: move the scrollbar, and load more hours when the view nears the bottom."""
+    scrollbar.set(first, last)
+    if float(last) > 0.9:
+        load_more_hourly()
 
 
-def update_temperature_graph(frame, hourly_data):
-    """Create/update temperature graph in the given frame"""
-    # Clear existing graph if any
-    for widget in frame.winfo_children():
-        widget.destroy()
-    
-    # Extract time and temperature data
-    times = []
-    temps = []
-    for period in hourly_data[:24]:  # Next 24 hours
-        time = datetime.fromisoformat(period.get('startTime', ''))
-        temp = period.get('temperature')
-        if temp is not None:
-            times.append(time)
-            temps.append(temp)
-    
-    # Create the figure and plot
+def load_more_hourly():
+    """Decode icons for the next page of hours on a worker thread, then add their rows."""
+    columns = hourly_view["columns"]
+    if columns is None or hourly_view["loading"] or hourly_view["loaded"] >= len(columns["startTime"]):
+        return
+    hourly_view["loading"] = True
+    start = hourly_view["loaded"]
+    stop = min(start + HOURLY_PAGE, len(columns["startTime"]))
+
+    def work():
+        icons = load_icons(columns["icon"][start:stop])
+        root.after(0, lambda: finish(icons))
+
+    def finish(icons):
+        if hourly_view["columns"] is not columns:
+            return  # a refresh replaced the series while we were loading
+        hourly_view["icons"].update((url, im) for url, im in icons.items() if im is not None)
+        hourly_view["loaded"] = stop
+        hourly_view["loading"] = False
+        with span("ui.hourly_page"):
+            sync_table(hourly_forecast_table, "hourly", hourly_rows(0, stop))
+
+    threading.Thread(target=work, daemon=True).start()
+
+
+def photo_for(url, pil_im):
+    """Shared PhotoImage for an icon URL, created once and reused by every row and refresh."""
+    if not url:
+        return None
+    if url not in icon_cache:
+        if pil_im is None:
+            return None
+        # The worker already decoded and resized the image; wrapping it is the only per-icon Tk work
+        from PIL import ImageTk
+        try:
+            with span("ui.photo"):
+                icon_cache[url] = ImageTk.PhotoImage(pil_im)
+        except Exception:
+            return None
+    return icon_cache[url]
+
+
+def sync_table(table, kind, rows):
+    """
+    Make table show rows, touching only what changed since the last call.
+    rows is a list of (key, values, icon URL, PIL image); returns the number of rows inserted, updated or deleted.
+    """
+    current = table_rows[kind]
+    wanted = {key: values for key, values, _, _ in rows}
+    changes = 0
+
+    for key in list(current):
+        if key not in wanted:
+            table.delete(key)
+            del current[key]
+            changes += 1
+
+    for index, (key, values, url, pil_im) in enumerate(rows):
+        photo = photo_for(url, pil_im)
+        new = (values, url, photo is not None)
+        old = current.get(key)
+        if old is None:
+            table.insert("", index, iid=key, text="", image=photo or "", values=values)
+            changes += 1
+        elif old != new:
+            if old[0] != values:
+                table.item(key, values=values)
+            if old[1:] != new[1:]:
+                # Icon changed, or it arrived after the row was first shown
+                table.item(key, image=photo or "")
+            changes += 1
+        current[key] = new
+
+    # Rows normally stay in order; only reorder when the period list was reshuffled
+    if list(table.get_children()) != list(wanted):
+        for index, key in enumerate(wanted):
+            table.move(key, "", index)
+    return changes
+
+
+def build_temperature_graph(frame):
+    """Create the temperature figure and canvas once; later refreshes only change the line data."""
+    # matplotlib is only imported the first time a graph is needed
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    import matplotlib.dates as mdates
+
+    build_start = time.perf_counter()
+
     fig = Figure(figsize=(10, 4), dpi=100)
     ax = fig.add_subplot(111)
     
-    # Plot temperature line
-    ax.plot(times, temps, '-o', color='#0078D7', linewidth=2, markersize=4)
+    # Temperature line; animated so blitting can redraw it over a cached background
+    line, = ax.plot([], [], '-o', color='#0078D7', linewidth=2, markersize=4, animated=True, label='Forecast')
+    # Past 24 hours from the observation archive, averaged per hour
+    observed_line, = ax.plot([], [], ':', color='#808080', linewidth=2, animated=True, label='Observed')
+    ax.legend(loc='upper right')
     
     # Customize the plot
     ax.set_title('24-Hour Temperature Forecast')
@@ -581,6 +855,7 @@ def update_temperature_graph(frame, hourly_data):
     ax.set_ylabel('Temperature (°F)')
     
     # Format x-axis to show hours
+    ax.xaxis_date()
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%I %p'))
     fig.autofmt_xdate()  # Rotate and align the tick labels
     
@@ -592,9 +867,96 @@ def update_temperature_graph(frame, hourly_data):
     
     # Create canvas and add to frame
     canvas = FigureCanvasTkAgg(fig, master=frame)
-    canvas.draw()
     canvas.get_tk_widget().pack(fill='both', expand=True, padx=10, pady=10)
 
+    def on_draw(event):
+        # Any full draw (including window resizes) refreshes the cached background
+        temperature_graph["background"] = canvas.copy_from_bbox(fig.bbox)
+        ax.draw_artist(observed_line)
+        ax.draw_artist(line)
+
+    canvas.mpl_connect("draw_event", on_draw)
+
+    temperature_graph.update(fig=fig, ax=ax, line=line, observed_line=observed_line, canvas=canvas, background=None, limits=None, pending=False)
+    graph_timings["build"] = time.perf_counter() - build_start
+    record_span("graph.build", build_start, build_start + graph_timings["build"])
+
+
+def graph_tab_visible():
+    try:
+        return notebook is not None and notebook.select() == str(graph_frame)
+    except tk.TclError:
+        return False
+
+
+def draw_temperature_graph():
+    """Redraw the graph if it has new data: blit the line when the axes are unchanged, else draw everything."""
+    if not temperature_graph or not temperature_graph["pending"]:
+        return
+    draw_start = time.perf_counter()
+    ax = temperature_graph["ax"]
+    canvas = temperature_graph["canvas"]
+
+    ax.relim()
+    ax.autoscale_view()
+    limits = (ax.get_xlim(), ax.get_ylim())
+    if limits == temperature_graph["limits"] and temperature_graph["background"] is not None:
+        canvas.restore_region(temperature_graph["background"])
+        ax.draw_artist(temperature_graph["observed_line"])
+        ax.draw_artist(temperature_graph["line"])
+        canvas.blit(temperature_graph["fig"].bbox)
+        graph_timings["mode"] = "blit"
+    else:
+        # Ticks and labels moved, so the cached background is stale
+        canvas.draw()
+        temperature_graph["limits"] = limits
+        graph_timings["mode"] = "full"
+
+    temperature_graph["pending"] = False
+    graph_timings["draw"] = time.perf_counter() - draw_start
+    record_span(f"graph.draw.{graph_timings['mode']}", draw_start, draw_start + graph_timings["draw"])
+
+
+def update_temperature_graph(frame, hourly_data):
+    """Update the temperature graph in the given frame; drawing waits until its tab is visible"""
+    if not temperature_graph:
+        build_temperature_graph(frame)
+    
+    # Extract time and temperature data
+    times = []
+    temps = []
+    for period in hourly_data[:24]:  # Next 24 hours
+        time = datetime.fromisoformat(period.get('startTime', ''))
+        temp = period.get('temperature')
+        if temp is not None:
+            times.append(time)
+            temps.append(temp)
+    
+    import matplotlib.dates as mdates
+    temperature_graph["line"].set_data(mdates.date2num(times), temps)
+    observed_times, observed_temps = observed_series
+    temperature_graph["observed_line"].set_data(
+        [mdates.date2num(datetime.fromtimestamp(t).astimezone()) for t in observed_times], observed_temps)
+    temperature_graph["pending"] = True
+    if graph_tab_visible():
+        draw_temperature_graph()
+
+
+def observed_history(station_id, hours=24):
+    """
+    Worker thread: archived temperatures for the last hours as hourly means, (Unix times, °F).
+    Reads and sorts archive files, so it must not run on the Tk thread.
+    """
+    if not station_id:
+        return [], []
+    now = time.time()
+    try:
+        history = query_observations(station_id, now - hours * 3600, now)
+    except (OSError, EOFError):
+        return [], []
+    times, temps = downsample(history["time"], history["temperature"], 3600)
+    return times, celsius_to_fahrenheit(temps)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,1683 @@
+"""
+Headless weather core: geocoding, NWS fetches, caches and reports, with no GUI imports.
+
+Used by WeatherProject.py (the Tk app) and as a command line tool:
+
+    python weather.py "Phoenix, AZ"
+    python weather.py --batch sites.txt --report report.csv
+    python weather.py --ingest KPHX --days 7
+    python weather.py --benchmark-units 100000
+    python weather.py --benchmark-decode
+    python weather.py --benchmark-refresh 100
+    python weather.py --benchmark-import
+
+Third-party packages (requests, geopy, PIL) are imported only when first
+needed. --benchmark-import checks that with python -X importtime and exits
+non-zero if any of HEAVY_IMPORTS is loaded by "import weather".
+"""
+import threading
+import json
+from datetime import datetime
+from io import BytesIO
+import traceback
+import time
+import os
+import re
+import hashlib
+import sqlite3
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, quote
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import codecs
+import sys
+from array import array
+import csv
+import argparse
+import bisect
+import math
+
+# Optional faster JSON backends; the standard library is used when they aren't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Created on the first uncached geocode so importing this module doesn't pull in geopy
+geolocator = None
+
+# Icon subsystem: pooled session, on-disk cache (bytes + ETag) and an LRU of decoded 32x32 images
+ICON_SIZE = (32, 32)
+ICON_MEMORY_LIMIT = 128
+ICON_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "icon_cache")
+icon_images = OrderedDict()  # url -> resized RGBA PIL image, oldest first
+icon_images_lock = threading.Lock()
+
+# Every NWS URL is built from this (benchmarks point it at a local stub server)
+NWS_BASE = "https://api.weather.gov"
+
+# Shared HTTP client: one keep-alive pool for every NWS and icon request
+HTTP_HEADERS = {
+    "User-Agent": "Logan Labinski (loganlabinski47@gmail.com)",
+    "Accept-Encoding": "gzip, deflate",
+}
+HOST_CONCURRENCY = 4  # max in-flight requests per host
+REQUESTS_PER_SECOND = 10  # global token bucket shared by all threads and hosts, used by batch runs
+REQUEST_BURST = 10
+rate_limit_enabled = False  # off for interactive fetches; run_batch turns it on
+rate_tokens = REQUEST_BURST
+rate_updated = 0.0
+rate_limit_lock = threading.Lock()
+http_session = None
+host_slots = {}
+host_slots_lock = threading.Lock()
+
+# Local SQLite cache shared by the geocode and /points caches
+CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weather_cache.sqlite3")
+
+# Geocode cache in front of Nominatim (1 request/second limit)
+GEOCODE_TTL = 30 * 24 * 3600  # seconds
+NOMINATIM_MIN_INTERVAL = 1.0  # seconds between uncached lookups
+geocode_memory = {}  # normalized address -> (lat, lon, stored_at)
+geocode_inflight = {}  # normalized address -> threading.Event for the lookup in progress (.result / .error once set)
+geocode_lock = threading.Lock()
+nominatim_lock = threading.Lock()
+last_nominatim_call = 0.0
+geocode_stats = {"hits": 0, "misses": 0}
+
+# /points metadata + nearest station, keyed by lat/lon rounded to 4 places
+POINTS_DEFAULT_TTL = 24 * 3600  # used when NWS sends no Cache-Control/Expires
+points_memory = {}  # key -> metadata dict (forecast URLs, station_id, expires_at)
+points_lock = threading.Lock()
+
+# Conditional GET store: url -> {"etag", "last_modified", "data"} where data is the parsed JSON
+response_store = {}
+response_store_lock = threading.Lock()
+
+# Span tracing for the fetch/UI pipeline; off by default and close to free while off
+tracing_enabled = False
+MAX_TRACE_EVENTS = 20000
+trace_events = []  # Chrome trace-event "X" (complete) events
+trace_lock = threading.Lock()
+trace_origin = time.perf_counter()
+NULL_SPAN = nullcontext()
+
+# Hourly periods whose icons are decoded with every fetch; later hours are loaded on demand
+HOURLY_PAGE = 24
+
+# The only forecast period fields the UI reads; everything else is dropped while parsing
+PERIOD_FIELDS = ("number", "name", "startTime", "temperature", "temperatureUnit", "shortForecast", "icon", "probabilityOfPrecipitation")
+
+# Per-request timings (seconds) from the last fetch, e.g. {"points": 0.21, "forecast": 0.34}
+fetch_timings = {}
+
+# Observation history archive: one directory per station holding append-only column files
+# (raw array bytes, one value per observation) plus a chunk index and a resume cursor
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "obs_archive")
+# column -> (array typecode, NWS observation property); values are kept in the units NWS sends
+ARCHIVE_COLUMNS = {
+    "time": ("d", None),  # Unix seconds
+    "temperature": ("f", "temperature"),  # degC
+    "dewpoint": ("f", "dewpoint"),  # degC
+    "wind_speed": ("f", "windSpeed"),  # km/h
+    "pressure": ("f", "barometricPressure"),  # Pa
+    "humidity": ("f", "relativeHumidity"),  # percent
+}
+ARCHIVE_PAGE_LIMIT = 500  # observations requested per page
+archive_lock = threading.Lock()
+
+# Unit conversion: NWS wind unitCode -> mph factor (observations usually report km/h)
+WIND_TO_MPH = {"wmoUnit:km_h-1": 0.621371, "wmoUnit:m_s-1": 2.23694}
+# The observation properties observation_columns/convert_columns work on, in this order
+OBSERVATION_COLUMNS = ("temperature", "dewpoint", "windSpeed", "barometricPressure", "visibility", "relativeHumidity", "heatIndex", "windChill")
+# When NWS leaves heatIndex/windChill null they are computed where NWS would report them
+HEAT_INDEX_MIN_F = 80
+WIND_CHILL_MAX_F = 50
+WIND_CHILL_MIN_MPH = 3
+numpy = None  # imported by load_numpy on first use; False once it is known to be missing
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def set_tracing(enabled):
+    global tracing_enabled
+    tracing_enabled = enabled
+
+
+def record_span(name, start, end, cat="weather"):
+    """Record a finished span from perf_counter() start/end times (no-op while tracing is off)."""
+    if not tracing_enabled:
+        return
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": (start - trace_origin) * 1e6,
+        "dur": (end - start) * 1e6,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    with trace_lock:
+        if len(trace_events) < MAX_TRACE_EVENTS:
+            trace_events.append(event)
+
+
+@contextmanager
+def recording_span(name, cat):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, start, time.perf_counter(), cat)
+
+
+def span(name, cat="weather"):
+    """with span("stage"): ... times the block; returns a shared no-op context while tracing is off."""
+    if not tracing_enabled:
+        return NULL_SPAN
+    return recording_span(name, cat)
+
+
+def clear_trace():
+    with trace_lock:
+        trace_events.clear()
+
+
+def span_summary():
+    """Per-stage totals for the diagnostics panel: [(name, count, total ms, max ms)], slowest first."""
+    totals = {}
+    with trace_lock:
+        for event in trace_events:
+            count, total, longest = totals.get(event["name"], (0, 0.0, 0.0))
+            totals[event["name"]] = (count + 1, total + event["dur"], max(longest, event["dur"]))
+    rows = [(name, count, total / 1000, longest / 1000) for name, (count, total, longest) in totals.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def export_trace(path):
+    """Write the recorded spans as a Chrome trace-event JSON file (open it in chrome://tracing or Perfetto)."""
+    with trace_lock:
+        events = list(trace_events)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def sniff_encoding(content, declared=None):
+    """Pick the encoding of a JSON body once: BOM first, then the declared charset, then UTF-8."""
+    for bom, enc in BOMS:
+        if content.startswith(bom):
+            return enc
+    if declared:
+        try:
+            return codecs.lookup(declared).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def decode_body(content, declared=None):
+    """Decode a response body to text in a single pass."""
+    enc = sniff_encoding(content, declared)
+    try:
+        return content.decode(enc)
+    except UnicodeDecodeError:
+        # Not valid in the sniffed encoding; latin-1 never fails and keeps the JSON structure intact
+        return content.decode("latin-1")
+
+
+def safe_json(response):
+    content = response.content
+    enc = sniff_encoding(content, response.encoding)
+    if orjson is not None and enc == "utf-8":
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(decode_body(content, response.encoding))
+
+
+def slim_period(p):
+    return {k: p[k] for k in PERIOD_FIELDS if k in p}
+
+
+def parse_periods(response):
+    """Return only the UI fields of properties.periods, streaming the body when ijson is available."""
+    content = response.content
+    if ijson is not None and sniff_encoding(content, response.encoding) == "utf-8":
+        try:
+            return [slim_period(p) for p in ijson.items(BytesIO(content), "properties.periods.item", use_float=True)]
+        except Exception:
+            pass
+    return [slim_period(p) for p in safe_json(response).get("properties", {}).get("periods", [])]
+
+
+def hourly_body(count=156):
+    """A synthetic gridpoints/forecast/hourly document with count periods, like NWS sends for 6.5 days."""
+    start = datetime(2025, 1, 1)
+    periods = [{
+        "number": i + 1,
+        "name": "",
+        "startTime": datetime.fromtimestamp(start.timestamp() + i * 3600).isoformat() + "-07:00",
+        "endTime": datetime.fromtimestamp(start.timestamp() + (i + 1) * 3600).isoformat() + "-07:00",
+        "isDaytime": 6 <= i % 24 < 18,
+        "temperature": 60 + i % 24,
+        "temperatureUnit": "F",
+        "temperatureTrend": "",
+        "probabilityOfPrecipitation": {"unitCode": "wmoUnit:percent", "value": i % 7 * 10},
+        "dewpoint": {"unitCode": "wmoUnit:degC", "value": 4.444444444444445},
+        "relativeHumidity": {"unitCode": "wmoUnit:percent", "value": 40 + i % 30},
+        "windSpeed": f"{5 + i % 10} mph",
+        "windDirection": "SW",
+        "icon": f"{NWS_BASE}/icons/land/day/few,{i % 7 * 10}?size=small",
+        "shortForecast": "Mostly Sunny",
+        "detailedForecast": f"Near {60 + i % 24}\N{DEGREE SIGN}F.",
+    } for i in range(count)]
+    return {"type": "Feature", "properties": {"units": "us", "periods": periods}}
+
+
+def benchmark_decoding(rounds=200, count=156):
+    """
+    Milliseconds per hourly body (count periods) for the old decode (response.json(), then trying six
+    encodings in turn, keeping whole periods) against safe_json and parse_periods, for a UTF-8 body,
+    one with a BOM and an undeclared latin-1 one. Every path must yield the same periods.
+    """
+    from requests.models import Response
+
+    def legacy_safe_json(response):
+        try:
+            return response.json()
+        except Exception:
+            content = response.content
+            if response.encoding:
+                try:
+                    return json.loads(content.decode(response.encoding))
+                except Exception:
+                    pass
+            for enc in ("utf-8", "utf-8-sig", "iso-8859-1", "latin-1", "cp1252"):
+                try:
+                    return json.loads(content.decode(enc))
+                except Exception:
+                    continue
+            return json.loads(content.decode("utf-8", errors="replace"))
+
+    def make_response(content):
+        response = Response()
+        response.status_code = 200
+        response._content = content
+        response.encoding = None  # NWS sends application/geo+json without a charset
+        return response
+
+    text = json.dumps(hourly_body(count), ensure_ascii=False)
+    bodies = {
+        "utf-8": text.encode("utf-8"),
+        "utf-8-bom": codecs.BOM_UTF8 + text.encode("utf-8"),
+        "latin-1": text.encode("latin-1"),
+    }
+    cases = {
+        "legacy_safe_json": lambda r: legacy_safe_json(r)["properties"]["periods"],
+        "safe_json": lambda r: safe_json(r)["properties"]["periods"],
+        "parse_periods": parse_periods,
+    }
+    results = {"periods": count, "orjson": orjson is not None, "ijson": ijson is not None}
+    for variant, content in bodies.items():
+        expected = [slim_period(p) for p in legacy_safe_json(make_response(content))["properties"]["periods"]]
+        timings = results[variant] = {}
+        for name, parse in cases.items():
+            periods = parse(make_response(content))
+            assert [slim_period(p) for p in periods] == expected, (variant, name)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                parse(make_response(content))
+            timings[name] = round((time.perf_counter() - start) / rounds * 1000, 3)
+    return results
+
+
+def alerts_url_for(lat, lon):
+    return f"{NWS_BASE}/alerts/active?point={lat},{lon}"
+
+
+def parse_alerts(response):
+    """Active alerts keyed by alert ID, keeping only what the UI shows and what tells versions apart."""
+    items = {}
+    for feature in safe_json(response).get("features", []):
+        props = feature.get("properties", {})
+        alert_id = feature.get("id") or props.get("id")
+        if not alert_id:
+            continue
+        items[alert_id] = {
+            "headline": props.get("headline") or props.get("event") or "",
+            "event": props.get("event"),
+            "severity": props.get("severity"),
+            "sent": props.get("sent"),
+            "expires": props.get("expires"),
+        }
+    return items
+
+
+def poll_alerts(lat, lon, timeout=10):
+    """
+    Conditional GET of just the active-alerts endpoint for a point.
+    Returns (alert items, changed); changed is False on a 304.
+    """
+    with span("nws.alerts_poll"):
+        return conditional_get_json(alerts_url_for(lat, lon), timeout=timeout, parse=parse_alerts)
+
+
+def diff_alerts(old, new):
+    """Compare two alert-item dicts; returns (new IDs, updated IDs, expired IDs)."""
+    added = [alert_id for alert_id in new if alert_id not in old]
+    updated = [alert_id for alert_id in new if alert_id in old and new[alert_id] != old[alert_id]]
+    expired = [alert_id for alert_id in old if alert_id not in new]
+    return added, updated, expired
+
+
+def hourly_columns(periods):
+    """
+    Columnar copy of the hourly series: one list or float array per field instead of one dict per hour.
+    Missing numbers are stored as NaN and repeated strings are interned, so a week of hours stays small.
+    """
+    columns = {
+        "startTime": [],
+        "temperature": array("f"),
+        "temperatureUnit": [],
+        "shortForecast": [],
+        "icon": [],
+        "precip": array("f"),
+    }
+    nan = float("nan")
+    for p in periods:
+        temp = p.get("temperature")
+        precip = (p.get("probabilityOfPrecipitation") or {}).get("value")
+        columns["startTime"].append(p.get("startTime", ""))
+        columns["temperature"].append(nan if temp is None else temp)
+        columns["temperatureUnit"].append(sys.intern(p.get("temperatureUnit", "")))
+        columns["shortForecast"].append(sys.intern(p.get("shortForecast", "")))
+        columns["icon"].append(sys.intern(p.get("icon") or ""))
+        columns["precip"].append(nan if precip is None else precip)
+    return columns
+
+
+def quantity(props, name):
+    """Numeric value of an NWS quantity property ({"value": ..., "unitCode": ...}), or None."""
+    value = (props.get(name) or {}).get("value")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def celsius_to_fahrenheit(values):
+    """°C -> °F for a number, a NumPy array or any iterable of numbers (NaN stays NaN)."""
+    if isinstance(values, (int, float)) or hasattr(values, "dtype"):
+        return values * 1.8 + 32
+    return array("d", (v * 1.8 + 32 for v in values))
+
+
+def heat_index_formula(temp_f, humidity):
+    """NWS heat index (Rothfusz regression) in °F; works element-wise on NumPy arrays too."""
+    t, rh = temp_f, humidity
+    return (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh - 0.00683783 * t * t
+            - 0.05481717 * rh * rh + 0.00122874 * t * t * rh + 0.00085282 * t * rh * rh - 0.00000199 * t * t * rh * rh)
+
+
+def wind_chill_formula(temp_f, wind_mph):
+    """NWS wind chill in °F; works element-wise on NumPy arrays too."""
+    v = wind_mph ** 0.16
+    return 35.74 + 0.6215 * temp_f - 35.75 * v + 0.4275 * temp_f * v
+
+
+def feels_like_f(temp_f, humidity, wind_mph, heat_index_c=None, wind_chill_c=None):
+    """NWS heat index or wind chill in °F, computed from the other fields when NWS left both null."""
+    if heat_index_c is not None:
+        return heat_index_c * 1.8 + 32
+    if wind_chill_c is not None:
+        return wind_chill_c * 1.8 + 32
+    if temp_f is None:
+        return None
+    if temp_f >= HEAT_INDEX_MIN_F and humidity is not None:
+        return heat_index_formula(temp_f, humidity)
+    if temp_f <= WIND_CHILL_MAX_F and wind_mph is not None and wind_mph >= WIND_CHILL_MIN_MPH:
+        return wind_chill_formula(temp_f, wind_mph)
+    return None
+
+
+def convert_observation(props):
+    """
+    Display units for one observation's properties, field by field: temperature_f, dewpoint_f,
+    wind_mph, pressure_hpa, visibility_km, humidity and feels_like_f (None where missing).
+    """
+    temp_c = quantity(props, "temperature")
+    dewpoint_c = quantity(props, "dewpoint")
+    wind = quantity(props, "windSpeed")
+    pressure = quantity(props, "barometricPressure")
+    visibility = quantity(props, "visibility")
+    humidity = quantity(props, "relativeHumidity")
+
+    temp_f = temp_c * 1.8 + 32 if temp_c is not None else None
+    wind_unit = (props.get("windSpeed") or {}).get("unitCode")
+    wind_mph = wind * WIND_TO_MPH.get(wind_unit, WIND_TO_MPH["wmoUnit:m_s-1"]) if wind is not None else None
+    return {
+        "temperature_f": temp_f,
+        "dewpoint_f": dewpoint_c * 1.8 + 32 if dewpoint_c is not None else None,
+        "wind_mph": wind_mph,
+        "pressure_hpa": pressure / 100 if pressure is not None else None,
+        "visibility_km": visibility / 1000 if visibility is not None else None,
+        "humidity": humidity,
+        "feels_like_f": feels_like_f(temp_f, humidity, wind_mph, quantity(props, "heatIndex"), quantity(props, "windChill")),
+    }
+
+
+def observation_columns(observations):
+    """
+    Columnar copy of many observations' properties for convert_columns: one float array per
+    OBSERVATION_COLUMNS property with NaN where the value is missing, plus a "wind_factor" column
+    turning each row's windSpeed (in that row's own unitCode) into mph.
+    """
+    nan = math.nan
+    columns = {name: array("d") for name in OBSERVATION_COLUMNS}
+    wind_factor = array("d")
+    default_factor = WIND_TO_MPH["wmoUnit:m_s-1"]
+    for props in observations:
+        for name, column in columns.items():
+            value = (props.get(name) or {}).get("value")
+            column.append(nan if value is None else value)
+        wind_factor.append(WIND_TO_MPH.get((props.get("windSpeed") or {}).get("unitCode"), default_factor))
+    columns["wind_factor"] = wind_factor
+    return columns
+
+
+def load_numpy():
+    """NumPy if it is installed (imported on first use), else None."""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as np
+        except ImportError:
+            np = False
+        numpy = np
+    return numpy or None
+
+
+def convert_columns(columns):
+    """
+    convert_observation for a whole observation_columns() table at once. Returns a dict of the same
+    keys holding float arrays, with NaN marking missing values. Runs as NumPy array operations with
+    boolean masks when NumPy is installed, otherwise in a single pure-Python pass.
+    """
+    np = load_numpy()
+    if np is None:
+        return convert_columns_python(columns)
+
+    col = {name: np.asarray(columns[name], dtype=np.float64) for name in OBSERVATION_COLUMNS}
+    temp_f = col["temperature"] * 1.8 + 32
+    humidity = col["relativeHumidity"]
+    wind_mph = col["windSpeed"] * np.asarray(columns["wind_factor"], dtype=np.float64)
+
+    # NWS values first, then the formulas only where NWS left both null and they apply
+    feels = np.where(np.isnan(col["heatIndex"]), col["windChill"], col["heatIndex"]) * 1.8 + 32
+    missing = np.isnan(feels)
+    with np.errstate(invalid="ignore"):
+        hot = missing & (temp_f >= HEAT_INDEX_MIN_F) & ~np.isnan(humidity)
+        cold = missing & ~hot & (temp_f <= WIND_CHILL_MAX_F) & (wind_mph >= WIND_CHILL_MIN_MPH)
+    feels[hot] = heat_index_formula(temp_f[hot], humidity[hot])
+    feels[cold] = wind_chill_formula(temp_f[cold], wind_mph[cold])
+    return {
+        "temperature_f": temp_f,
+        "dewpoint_f": col["dewpoint"] * 1.8 + 32,
+        "wind_mph": wind_mph,
+        "pressure_hpa": col["barometricPressure"] / 100,
+        "visibility_km": col["visibility"] / 1000,
+        "humidity": humidity,
+        "feels_like_f": feels,
+    }
+
+
+def convert_columns_python(columns):
+    """convert_columns without NumPy: one pass over the columns, NaN in and NaN out."""
+    nan = math.nan
+    out = {name: array("d") for name in ("temperature_f", "dewpoint_f", "wind_mph", "pressure_hpa", "visibility_km", "humidity", "feels_like_f")}
+    rows = zip(*(columns[name] for name in OBSERVATION_COLUMNS), columns["wind_factor"])
+    for temp_c, dewpoint_c, wind, pressure, visibility, humidity, heat_index_c, wind_chill_c, wind_factor in rows:
+        temp_f = temp_c * 1.8 + 32
+        wind_mph = wind * wind_factor
+        out["temperature_f"].append(temp_f)
+        out["dewpoint_f"].append(dewpoint_c * 1.8 + 32)
+        out["wind_mph"].append(wind_mph)
+        out["pressure_hpa"].append(pressure / 100)
+        out["visibility_km"].append(visibility / 1000)
+        out["humidity"].append(humidity)
+        feels = feels_like_f(
+            None if temp_f != temp_f else temp_f,
+            None if humidity != humidity else humidity,
+            None if wind_mph != wind_mph else wind_mph,
+            None if heat_index_c != heat_index_c else heat_index_c,
+            None if wind_chill_c != wind_chill_c else wind_chill_c)
+        out["feels_like_f"].append(nan if feels is None else feels)
+    return out
+
+
+def benchmark_conversions(count=100000, seed=1):
+    """
+    Time convert_observation per record against observation_columns + convert_columns on count
+    synthetic observations (about 10% of values missing). Returns seconds per stage.
+    """
+    import random
+    rng = random.Random(seed)
+
+    def field(low, high, unit):
+        return {"value": None if rng.random() < 0.1 else rng.uniform(low, high), "unitCode": unit}
+
+    observations = [{
+        "temperature": field(-20, 40, "wmoUnit:degC"),
+        "dewpoint": field(-25, 25, "wmoUnit:degC"),
+        "windSpeed": field(0, 60, rng.choice(("wmoUnit:km_h-1", "wmoUnit:m_s-1"))),
+        "barometricPressure": field(98000, 104000, "wmoUnit:Pa"),
+        "visibility": field(0, 16000, "wmoUnit:m"),
+        "relativeHumidity": field(5, 100, "wmoUnit:percent"),
+        "heatIndex": {"value": None, "unitCode": "wmoUnit:degC"},
+        "windChill": {"value": None, "unitCode": "wmoUnit:degC"},
+    } for _ in range(count)]
+
+    timings = {"records": count, "numpy": load_numpy() is not None}
+    start = time.perf_counter()
+    for props in observations:
+        convert_observation(props)
+    timings["per_field"] = time.perf_counter() - start
+    start = time.perf_counter()
+    columns = observation_columns(observations)
+    timings["columns_build"] = time.perf_counter() - start
+    start = time.perf_counter()
+    convert_columns(columns)
+    timings["columns_convert"] = time.perf_counter() - start
+    return timings
+
+
+def format_time(iso_str):
+    try:
+        dt = datetime.fromisoformat(iso_str)
+        return dt.strftime("%I %p").lstrip("0")
+    except Exception:
+        return iso_str
+
+
+def normalize_address(address):
+    """Cache key for an address: lowercase, punctuation dropped, whitespace collapsed."""
+    return " ".join(re.sub(r"[^\w\s]", " ", address.lower()).split())
+
+
+def open_cache_db():
+    """Open the local cache database, creating its tables on first use."""
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS geocode (key TEXT PRIMARY KEY, lat REAL, lon REAL, stored_at REAL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS points (key TEXT PRIMARY KEY, metadata TEXT, expires_at REAL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS snapshots (key TEXT PRIMARY KEY, fetched_at REAL, data TEXT)")
+    return conn
+
+
+def geocode_db_read(key):
+    try:
+        with open_cache_db() as conn:
+            return conn.execute("SELECT lat, lon, stored_at FROM geocode WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        return None
+
+
+def geocode_db_write(key, lat, lon, stored_at):
+    try:
+        with open_cache_db() as conn:
+            conn.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)", (key, lat, lon, stored_at))
+    except sqlite3.Error:
+        pass
+
+
+def geocode_nominatim(address):
+    """Call Nominatim, spacing calls at least NOMINATIM_MIN_INTERVAL apart."""
+    global last_nominatim_call, geolocator
+    with nominatim_lock:
+        if geolocator is None:
+            from geopy.geocoders import Nominatim
+            geolocator = Nominatim(user_agent="(Logan Labinski, student, loganlabinski47@gmail.com)")
+        wait = last_nominatim_call + NOMINATIM_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            return geolocator.geocode(address, timeout=10)
+        finally:
+            last_nominatim_call = time.monotonic()
+
+
+def geocode_cached(address):
+    """Return (lat, lon) for address, or None if it wasn't found.
+
+    Results are cached in memory and in SQLite for GEOCODE_TTL. Concurrent
+    lookups of the same normalized address share a single Nominatim call, and
+    if that call raises, every waiting lookup raises the same error.
+    """
+    key = normalize_address(address)
+    with geocode_lock:
+        entry = geocode_memory.get(key)
+    if entry is None:
+        # SQLite is read outside the lock so lookups of other addresses don't queue behind it
+        entry = geocode_db_read(key)
+    with geocode_lock:
+        if entry is not None:
+            geocode_memory.setdefault(key, entry)
+            if time.time() - entry[2] < GEOCODE_TTL:
+                geocode_stats["hits"] += 1
+                return entry[0], entry[1]
+        pending = geocode_inflight.get(key)
+        leader = pending is None
+        if leader:
+            pending = geocode_inflight[key] = threading.Event()
+            pending.result = pending.error = None
+            geocode_stats["misses"] += 1
+
+    if not leader:
+        # Someone else is already looking this address up; share their outcome
+        pending.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    try:
+        loc = geocode_nominatim(address)
+        if loc:
+            entry = (loc.latitude, loc.longitude, time.time())
+            with geocode_lock:
+                geocode_memory[key] = entry
+            geocode_db_write(key, *entry)
+            pending.result = entry[0], entry[1]
+        return pending.result
+    except Exception as e:
+        pending.error = e
+        raise
+    finally:
+        with geocode_lock:
+            geocode_inflight.pop(key).set()
+
+
+def cache_expiry(response, default_ttl):
+    """Absolute expiry time for a response from its Cache-Control max-age or Expires header."""
+    match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    if match:
+        return time.time() + int(match.group(1))
+    try:
+        return parsedate_to_datetime(response.headers["Expires"]).timestamp()
+    except Exception:
+        return time.time() + default_ttl
+
+
+def points_key(lat, lon):
+    return f"{lat:.4f},{lon:.4f}"
+
+
+def points_cache_read(key):
+    """Return cached gridpoint metadata for key, or None if missing or expired."""
+    with points_lock:
+        metadata = points_memory.get(key)
+    if metadata is None:
+        try:
+            with open_cache_db() as conn:
+                row = conn.execute("SELECT metadata FROM points WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            return None
+        metadata = json.loads(row[0])
+        with points_lock:
+            points_memory[key] = metadata
+    # Hand out a copy so callers can fill in fields without touching the cache
+    return dict(metadata) if time.time() < metadata["expires_at"] else None
+
+
+def points_cache_write(key, metadata):
+    with points_lock:
+        points_memory[key] = metadata
+    try:
+        with open_cache_db() as conn:
+            conn.execute("INSERT OR REPLACE INTO points VALUES (?, ?, ?)", (key, json.dumps(metadata), metadata["expires_at"]))
+    except sqlite3.Error:
+        pass
+
+
+def make_http_session():
+    """Build a pooled session that retries 429/5xx responses with exponential backoff."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HTTP_HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def set_rate_limit(enabled):
+    global rate_limit_enabled
+    rate_limit_enabled = enabled
+
+
+def rate_limit_wait():
+    """Block until the global token bucket allows another request (bursts up to REQUEST_BURST)."""
+    global rate_tokens, rate_updated
+    while True:
+        with rate_limit_lock:
+            now = time.monotonic()
+            rate_tokens = min(REQUEST_BURST, rate_tokens + (now - rate_updated) * REQUESTS_PER_SECOND)
+            rate_updated = now
+            if rate_tokens >= 1:
+                rate_tokens -= 1
+                return
+            wait = (1 - rate_tokens) / REQUESTS_PER_SECOND
+        time.sleep(wait)
+
+
+def http_get(url, headers=None, timeout=15):
+    """
+    GET through the shared session, holding one of the per-host concurrency slots
+    (and a token from the global bucket while the rate limit is on).
+    """
+    global http_session
+    host = urlsplit(url).netloc
+    with host_slots_lock:
+        if http_session is None:
+            http_session = make_http_session()
+        slot = host_slots.setdefault(host, threading.BoundedSemaphore(HOST_CONCURRENCY))
+    with slot:
+        if rate_limit_enabled:
+            rate_limit_wait()
+        return http_session.get(url, headers=headers, timeout=timeout)
+
+
+def conditional_get_json(url, timeout=15, parse=safe_json):
+    """GET url as JSON with If-None-Match/If-Modified-Since from the last response.
+
+    Returns (data, changed). On a 304 the previously parsed object is returned
+    as-is with changed=False, so nothing is downloaded or decoded again.
+    Callers must treat the returned data as read-only.
+    """
+    with response_store_lock:
+        stored = response_store.get(url)
+    headers = {}
+    if stored:
+        if stored["etag"]:
+            headers["If-None-Match"] = stored["etag"]
+        if stored["last_modified"]:
+            headers["If-Modified-Since"] = stored["last_modified"]
+
+    r = http_get(url, headers=headers, timeout=timeout)
+    if r.status_code == 304 and stored:
+        return stored["data"], False
+
+    data = parse(r)
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    if r.ok and (etag or last_modified):
+        with response_store_lock:
+            response_store[url] = {"etag": etag, "last_modified": last_modified, "data": data}
+    return data, True
+
+
+def icon_cache_path(url):
+    """Path of the on-disk cache entry for an icon URL (without extension)."""
+    return os.path.join(ICON_CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+
+def replace_file(path, data):
+    """Write bytes to path through a temp file and a rename, so readers never see a torn file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # unique per writer thread
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def download_icon_bytes(url, timeout=10, cached_only=False):
+    """Return raw bytes of icon or None on failure.
+
+    Bytes are kept on disk next to their ETag, so a cached icon is only
+    revalidated with If-None-Match instead of downloaded again. With
+    cached_only, the disk copy is returned without touching the network.
+    """
+    if not url:
+        return None
+    path = icon_cache_path(url)
+    cached = None
+    etag = None
+    try:
+        with open(path + ".img", "rb") as f:
+            cached = f.read()
+        with open(path + ".etag", "r", encoding="utf-8") as f:
+            etag = f.read().strip() or None
+    except OSError:
+        pass
+
+    if cached_only:
+        return cached
+
+    headers = {"If-None-Match": etag} if cached is not None and etag else {}
+    try:
+        r = http_get(url, headers=headers, timeout=timeout)
+        if r.status_code == 304 and cached is not None:
+            return cached
+        r.raise_for_status()
+    except Exception:
+        # Stale bytes are better than no icon at all
+        return cached
+
+    try:
+        os.makedirs(ICON_CACHE_DIR, exist_ok=True)
+        # Drop the old ETag first and write the new one last: an .img is only ever
+        # revalidated against the ETag of the bytes actually in it
+        try:
+            os.remove(path + ".etag")
+        except FileNotFoundError:
+            pass
+        replace_file(path + ".img", r.content)
+        replace_file(path + ".etag", r.headers.get("ETag", "").encode("utf-8"))
+    except OSError:
+        pass
+    return r.content
+
+
+def load_icon(url, cached_only=False):
+    """Return the decoded 32x32 RGBA image for url, or None.
+
+    Decoded images are kept in a small LRU, so a repeat lookup makes no
+    request and does no resize.
+    """
+    if not url:
+        return None
+    with icon_images_lock:
+        if url in icon_images:
+            icon_images.move_to_end(url)
+            return icon_images[url]
+
+    with span("icon.download"):
+        img_bytes = download_icon_bytes(url, cached_only=cached_only)
+    if not img_bytes:
+        return None
+    from PIL import Image
+    try:
+        with span("icon.resize"):
+            pil_im = Image.open(BytesIO(img_bytes)).convert("RGBA")
+            pil_im = pil_im.resize(ICON_SIZE, Image.LANCZOS)
+    except Exception:
+        return None
+
+    with icon_images_lock:
+        icon_images[url] = pil_im
+        icon_images.move_to_end(url)
+        while len(icon_images) > ICON_MEMORY_LIMIT:
+            icon_images.popitem(last=False)
+    return pil_im
+
+
+def load_icons(urls, max_workers=8, cached_only=False):
+    """Load every unique URL in urls in parallel; returns {url: image or None}."""
+    unique_urls = list(dict.fromkeys(u for u in urls if u))
+    if not unique_urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(unique_urls, executor.map(lambda u: load_icon(u, cached_only), unique_urls)))
+
+
+# Fields of a fetch_weather result kept in a snapshot (icons are stored as URLs in the periods)
+SNAPSHOT_FIELDS = ("address", "lat", "lon", "station_id", "observation", "current_text", "alerts", "alert_items", "periods", "hourly_periods", "forecast_key")
+
+
+def save_snapshot(result):
+    """Persist a successful fetch_weather result so the app can start from it, even offline."""
+    data = {k: result[k] for k in SNAPSHOT_FIELDS}
+    try:
+        with open_cache_db() as conn:
+            conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                         (normalize_address(result["address"]), result["fetched_at"], json.dumps(data)))
+    except (sqlite3.Error, TypeError, ValueError):
+        pass
+
+
+def load_snapshot(address=None, load_images=True):
+    """
+    Return the saved result for address (default: the most recent one) in fetch_weather's shape,
+    or None if nothing was saved. Icons come from the disk cache only; with load_images=False
+    they are left empty so the caller can fill them in later with load_snapshot_icons.
+    """
+    try:
+        with open_cache_db() as conn:
+            if address is None:
+                row = conn.execute("SELECT fetched_at, data FROM snapshots ORDER BY fetched_at DESC LIMIT 1").fetchone()
+            else:
+                row = conn.execute("SELECT fetched_at, data FROM snapshots WHERE key = ?", (normalize_address(address),)).fetchone()
+    except sqlite3.Error:
+        return None
+    if row is None:
+        return None
+
+    result = json.loads(row[1])
+    result["forecast_key"] = tuple(result["forecast_key"])
+    result.setdefault("alert_items", {})
+    result.update(error=None, fetched_at=row[0], daily_icons=[], hourly_icons=[], forecast_changed=True, timings={})
+    if load_images:
+        load_snapshot_icons(result)
+    return result
+
+
+def load_snapshot_icons(result):
+    """Fill in a snapshot's daily_icons/hourly_icons from the disk icon cache (no network)."""
+    icons = load_icons([p.get("icon") for p in result["periods"] + result["hourly_periods"][:HOURLY_PAGE]], cached_only=True)
+    result["daily_icons"] = [icons.get(p.get("icon")) for p in result["periods"]]
+    result["hourly_icons"] = [icons.get(p.get("icon")) for p in result["hourly_periods"][:HOURLY_PAGE]]
+    return result
+
+
+def fetch_weather(address, load_images=True):
+    """
+    Headless fetch for one address: geocoding, NWS calls and (optionally) icon decoding.
+    Safe to call from any thread. Returns a result dict; on failure it only has "address" and "error".
+    """
+    try:
+        # Geocode (this is blocking — but in worker thread that's okay)
+        with span("geocode"):
+            loc = geocode_cached(address)
+    except Exception as e:
+        return {"address": address, "error": f"Geocoding error: {e}"}
+
+    if not loc:
+        return {"address": address, "error": "Address not found."}
+
+    lat, lon = loc
+
+    timings = {}
+    changed = {}
+
+    def timed_response(name, url):
+        """GET url and record how long it took under timings[name]."""
+        start = time.perf_counter()
+        try:
+            return http_get(url, timeout=15)
+        finally:
+            timings[name] = time.perf_counter() - start
+            record_span(f"nws.{name}", start, start + timings[name])
+
+    def timed_get(name, url, parse=safe_json):
+        """Conditional GET of url as JSON; records timing and whether the payload changed."""
+        start = time.perf_counter()
+        try:
+            data, changed[name] = conditional_get_json(url, timeout=15, parse=parse)
+            return data
+        finally:
+            timings[name] = time.perf_counter() - start
+            record_span(f"nws.{name}", start, start + timings[name])
+
+    def get_observation(metadata):
+        # Only the observation depends on the stations response, so it runs as one chain.
+        # A cached station ID skips the stations request entirely.
+        if not metadata.get("station_id"):
+            stations_response = timed_response("stations", metadata["observationStations"])
+            stations_data = safe_json(stations_response)
+            metadata["station_id"] = stations_data["features"][0]["properties"]["stationIdentifier"]
+            metadata["expires_at"] = min(metadata["expires_at"], cache_expiry(stations_response, POINTS_DEFAULT_TTL))
+        station_id = metadata["station_id"]
+        latest_obs_url = f"{NWS_BASE}/stations/{station_id}/observations/latest"
+        return station_id, timed_get("observation", latest_obs_url)
+
+    def get_periods(name, url):
+        if not url:
+            return []
+        return timed_get(name, url, parse=parse_periods)
+
+    try:
+        fetch_start = time.perf_counter()
+
+        # single /points call, unless the gridpoint metadata is still cached
+        key = points_key(lat, lon)
+        metadata = points_cache_read(key)
+        cached_metadata = metadata is not None
+        if not cached_metadata:
+            points_url = f"{NWS_BASE}/points/{lat},{lon}"
+            points_response = timed_response("points", points_url)
+            points_props = safe_json(points_response)["properties"]
+            metadata = {
+                "forecast": points_props.get("forecast"),
+                "forecastHourly": points_props.get("forecastHourly"),
+                "observationStations": points_props["observationStations"],
+                "station_id": None,
+                "expires_at": cache_expiry(points_response, POINTS_DEFAULT_TTL),
+            }
+
+        # Everything after /points is independent, so fan the requests out at once
+        alerts_url = alerts_url_for(lat, lon)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            obs_future = executor.submit(get_observation, metadata)
+            daily_future = executor.submit(get_periods, "forecast", metadata.get("forecast"))
+            hourly_future = executor.submit(get_periods, "forecastHourly", metadata.get("forecastHourly"))
+            alerts_future = executor.submit(timed_get, "alerts", alerts_url, parse_alerts)
+
+            station_id, obs_data = obs_future.result()
+            periods = daily_future.result()
+            hourly_periods = hourly_future.result()
+            alert_items = alerts_future.result()
+
+        if not cached_metadata:
+            points_cache_write(key, metadata)
+
+        forecast_key = (metadata.get("forecast"), metadata.get("forecastHourly"))
+        forecast_changed = changed.get("forecast", True) or changed.get("forecastHourly", True)
+
+        # Decode icons here (deduplicated, in parallel) so the main thread only wraps them in PhotoImage
+        daily_icons = []
+        hourly_icons = []
+        if load_images:
+            icon_start = time.perf_counter()
+            icons = load_icons([p.get("icon") for p in periods + hourly_periods[:HOURLY_PAGE]])
+            daily_icons = [icons.get(p.get("icon")) for p in periods]
+            hourly_icons = [icons.get(p.get("icon")) for p in hourly_periods[:HOURLY_PAGE]]
+            timings["icons"] = time.perf_counter() - icon_start
+            record_span("icons", icon_start, icon_start + timings["icons"])
+
+        alert_messages = [item["headline"] for item in alert_items.values() if item["headline"]]
+
+        timings["total"] = time.perf_counter() - fetch_start
+        fetch_timings.clear()
+        fetch_timings.update(timings)
+    except Exception as e:
+        tb = traceback.format_exc()
+        return {"address": address, "error": f"Network/API error: {e}\n{tb.splitlines()[-1]}"}
+
+    # Build current conditions text (done here so worker threads never need to touch UI)
+    props = {}
+    try:
+        props = obs_data.get("properties", {})
+
+        values = convert_observation(props)
+        text_desc = props.get("textDescription", "N/A")
+        wind_direction = (props.get("windDirection") or {}).get("value")
+
+        text_lines = [f"Current conditions at {station_id}:"]
+        if values["temperature_f"] is not None:
+            text_lines.append(f"Temperature: {values['temperature_f']:.1f}\N{DEGREE SIGN}F")
+        else:
+            text_lines.append("Temperature: Not available")
+        if values["feels_like_f"] is not None:
+            text_lines.append(f"Feels Like: {values['feels_like_f']:.1f}\N{DEGREE SIGN}F")
+
+        text_lines.append(f"Conditions: {text_desc}")
+
+        # Add wind information
+        if values["wind_mph"] is not None:
+            direction_text = ""
+            if wind_direction is not None:
+                direction_text = f" from {wind_direction}\N{DEGREE SIGN}"
+            text_lines.append(f"Wind: {values['wind_mph']:.1f} mph{direction_text}")
+
+        if values["humidity"] is not None:
+            text_lines.append(f"Humidity: {values['humidity']:.0f}%")
+        if values["pressure_hpa"] is not None:
+            text_lines.append(f"Pressure: {values['pressure_hpa']:.1f} hPa")
+        if values["visibility_km"] is not None:
+            text_lines.append(f"Visibility: {values['visibility_km']:.1f} km")
+
+        # Alerts are returned separately (alerts / alert_items) so they can be updated on their own
+
+        current_text = "\n".join(text_lines)
+    except Exception as e:
+        current_text = f"Error building current conditions: {e}"
+
+    result = {
+        "address": address,
+        "error": None,
+        "fetched_at": time.time(),
+        "lat": lat,
+        "lon": lon,
+        "station_id": station_id,
+        "observation": props,
+        "current_text": current_text,
+        "alerts": alert_messages,
+        "alert_items": alert_items,
+        "periods": periods,
+        "hourly_periods": hourly_periods,
+        "daily_icons": daily_icons,
+        "hourly_icons": hourly_icons,
+        "forecast_key": forecast_key,
+        "forecast_changed": forecast_changed,
+        "timings": timings,
+    }
+    return result
+
+
+def run_batch(addresses, max_workers=8, rate_limit=True):
+    """
+    Fetch many addresses concurrently; returns one result per address, in order.
+    Geocode, /points and response caches are shared, and with rate_limit every
+    request goes through the global token bucket in http_get for the duration.
+    """
+    previous = rate_limit_enabled
+    set_rate_limit(rate_limit)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda a: fetch_weather(a, load_images=False), addresses))
+    finally:
+        set_rate_limit(previous)
+
+
+def report_row(result):
+    """Flat, JSON/CSV-friendly summary of one fetch_weather result."""
+    row = {"address": result["address"], "error": result["error"]}
+    if result["error"]:
+        return row
+    props = result["observation"]
+    temp_f = convert_observation(props)["temperature_f"]
+    first = result["periods"][0] if result["periods"] else {}
+    row.update({
+        "lat": result["lat"],
+        "lon": result["lon"],
+        "station_id": result["station_id"],
+        "temperature_f": round(temp_f, 1) if temp_f is not None else None,
+        "conditions": props.get("textDescription"),
+        "forecast": f"{first.get('name', '')}: {first.get('shortForecast', '')}, {first.get('temperature', '')}{first.get('temperatureUnit', '')}" if first else None,
+        "alerts": " | ".join(result["alerts"]),
+    })
+    return row
+
+
+def json_report(results):
+    """Report rows for results, with the forecast periods of every successful lookup."""
+    rows = [report_row(r) for r in results]
+    for row, result in zip(rows, results):
+        if not result["error"]:
+            row["periods"] = result["periods"]
+            row["hourly_periods"] = result["hourly_periods"]
+    return rows
+
+
+def write_batch_report(results, path):
+    """Write batch results to path as CSV (for .csv) or JSON (anything else)."""
+    if path.lower().endswith(".csv"):
+        rows = [report_row(r) for r in results]
+        fields = ["address", "lat", "lon", "station_id", "temperature_f", "conditions", "forecast", "alerts", "error"]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(json_report(results), f, indent=2)
+
+
+def archive_dir(station_id):
+    return os.path.join(ARCHIVE_DIR, re.sub(r"[^A-Za-z0-9_-]", "_", station_id))
+
+
+def read_archive_index(directory):
+    """Chunk index as a flat float array: (first time, last time, first row, row count) per chunk."""
+    index = array("d")
+    path = os.path.join(directory, "index.f64")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        index.frombytes(data[:len(data) - len(data) % 32])  # ignore a torn last entry
+    return index
+
+
+def read_archive_cursor(directory):
+    try:
+        with open(os.path.join(directory, "cursor.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_archive_cursor(directory, cursor):
+    path = os.path.join(directory, "cursor.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cursor, f)
+    os.replace(path + ".tmp", path)
+
+
+def append_archive_chunk(directory, rows):
+    """
+    Append rows (dicts of ARCHIVE_COLUMNS, sorted by time) as one chunk. Column files are first
+    cut back to the indexed row count, so a chunk interrupted half-way is never visible or doubled.
+    """
+    index = read_archive_index(directory)
+    start_row = int(sum(index[3::4]))
+    for name, (typecode, _) in ARCHIVE_COLUMNS.items():
+        path = os.path.join(directory, f"{name}.{typecode}")
+        column = array(typecode, [row[name] for row in rows])
+        with open(path, "ab") as f:
+            f.truncate(start_row * column.itemsize)
+            column.tofile(f)
+    with open(os.path.join(directory, "index.f64"), "ab") as f:
+        f.truncate(len(index) * index.itemsize)  # drop a torn last entry so new ones stay aligned
+        array("d", [rows[0]["time"], rows[-1]["time"], start_row, len(rows)]).tofile(f)
+
+
+def observation_row(feature):
+    """Archive row from one /observations feature, or None if it has no usable timestamp."""
+    props = feature.get("properties") or {}
+    try:
+        row = {"time": datetime.fromisoformat(props["timestamp"]).timestamp()}
+    except (KeyError, TypeError, ValueError):
+        return None
+    for name, (_, prop) in ARCHIVE_COLUMNS.items():
+        if prop:
+            value = (props.get(prop) or {}).get("value")
+            row[name] = math.nan if value is None else value
+    return row
+
+
+def ingest_observations(station_id, since=None, max_pages=None):
+    """
+    Page through a station's observation history into its archive and return the rows added.
+
+    Picks up after the newest archived observation, or at since (Unix seconds) for an empty
+    archive (default: all the history NWS serves). Each page is committed as a
+    chunk before the cursor moves on, so an interrupted run resumes at the next page; timestamps
+    already in the archive are skipped, so overlapping pages or re-runs never duplicate rows.
+    """
+    directory = archive_dir(station_id)
+    with archive_lock:
+        os.makedirs(directory, exist_ok=True)
+        known = set(read_archive_column(directory, "time"))
+        cursor = read_archive_cursor(directory)
+
+    url = cursor.get("next")
+    if not url:
+        start = max(known) if known else since
+        url = f"{NWS_BASE}/stations/{station_id}/observations?limit={ARCHIVE_PAGE_LIMIT}"
+        if start is not None:
+            url += "&start=" + quote(datetime.fromtimestamp(start).astimezone().isoformat(timespec="seconds"))
+
+    added = 0
+    pages = 0
+    while url and (max_pages is None or pages < max_pages):
+        with span("archive.page"):
+            r = http_get(url, headers={"Accept": "application/geo+json"})
+            r.raise_for_status()
+            data = safe_json(r)
+        pages += 1
+        rows = {}
+        for feature in data.get("features") or []:
+            row = observation_row(feature)
+            if row and row["time"] not in known:
+                rows[row["time"]] = row
+        # NWS pages run newest to oldest and an empty page means the history is exhausted
+        url = (data.get("pagination") or {}).get("next") if data.get("features") else None
+        with archive_lock:
+            if rows:
+                append_archive_chunk(directory, [rows[t] for t in sorted(rows)])
+                known.update(rows)
+                added += len(rows)
+            write_archive_cursor(directory, {"next": url})
+    return added
+
+
+def archive_row_count(directory, names):
+    """Rows actually on disk in every one of the named column files (the shortest one wins)."""
+    counts = []
+    for name in names:
+        typecode = ARCHIVE_COLUMNS[name][0]
+        path = os.path.join(directory, f"{name}.{typecode}")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        counts.append(size // array(typecode).itemsize)
+    return min(counts)
+
+
+def read_archive_column(directory, name, chunks=None):
+    """One column as an array; chunks limits it to (first row, row count) slices of the file."""
+    typecode = ARCHIVE_COLUMNS[name][0]
+    column = array(typecode)
+    path = os.path.join(directory, f"{name}.{typecode}")
+    if not os.path.exists(path):
+        return column
+    index = read_archive_index(directory)
+    if chunks is None:
+        chunks = [(0, int(sum(index[3::4])))]
+    with open(path, "rb") as f:
+        for first, count in chunks:
+            f.seek(first * column.itemsize)
+            column.fromfile(f, count)
+    return column
+
+
+def query_observations(station_id, start, end, columns=("temperature",)):
+    """
+    Archived observations with start <= time <= end (Unix seconds), sorted by time, as
+    {"time": array, column: array, ...}. Only the chunks whose time span overlaps are read.
+    """
+    directory = archive_dir(station_id)
+    with archive_lock:
+        index = read_archive_index(directory)
+        names = ("time",) + tuple(columns)
+        available = archive_row_count(directory, names)
+        # A chunk reaching past the column files was indexed but never fully written; skip it
+        chunks = [(int(index[i + 2]), int(index[i + 3])) for i in range(0, len(index), 4)
+                  if index[i] <= end and index[i + 1] >= start and index[i + 2] + index[i + 3] <= available]
+        loaded = {name: read_archive_column(directory, name, chunks) for name in names}
+
+    order = sorted(range(len(loaded["time"])), key=loaded["time"].__getitem__)
+    times = array("d", (loaded["time"][i] for i in order))
+    lo = bisect.bisect_left(times, start)
+    hi = bisect.bisect_right(times, end)
+    result = {"time": times[lo:hi]}
+    for name in columns:
+        typecode = ARCHIVE_COLUMNS[name][0]
+        result[name] = array(typecode, (loaded[name][i] for i in order[lo:hi]))
+    return result
+
+
+def downsample(times, values, bucket_seconds):
+    """
+    Average values into fixed time buckets, skipping NaN. Returns (bucket start times, means)
+    with empty buckets left out, e.g. five-minute observations -> hourly points for the graph.
+    """
+    out_times = array("d")
+    out_values = array("f")
+    bucket = None
+    total = 0.0
+    count = 0
+    for t, v in zip(times, values):
+        b = t - t % bucket_seconds
+        if b != bucket:
+            if count:
+                out_times.append(bucket)
+                out_values.append(total / count)
+            bucket, total, count = b, 0.0, 0
+        if not math.isnan(v):
+            total += v
+            count += 1
+    if count:
+        out_times.append(bucket)
+        out_values.append(total / count)
+    return out_times, out_values
+
+
+def self_signed_cert(directory):
+    """Write a throwaway certificate and key for 127.0.0.1 into directory with openssl; returns (cert, key)."""
+    import subprocess
+    certfile = os.path.join(directory, "stub_cert.pem")
+    keyfile = os.path.join(directory, "stub_key.pem")
+    try:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                        "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                        "-keyout", keyfile, "-out", certfile], capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise RuntimeError(f"openssl is needed to make a certificate for the HTTPS stub: {e}")
+    return certfile, keyfile
+
+
+def nws_stub_server(latency=0.1, certfile=None, keyfile=None, connect_latency=0.0):
+    """
+    A local stand-in for api.weather.gov on a free port: /points, the gridpoint forecasts and
+    stations, the latest observation and active alerts, each answered after latency seconds and
+    with an ETag, so a repeated request gets a 304. With certfile/keyfile it serves HTTPS, and each
+    new connection first waits connect_latency (the TCP and TLS round trips a real network adds)
+    and then does its TLS handshake. server.connections counts the connections accepted.
+    Returns (server, base URL); run server.serve_forever() in a thread and call
+    server.shutdown() when done.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            with lock:
+                server.connections += 1
+            time.sleep(connect_latency)
+            if certfile:
+                self.request.do_handshake()
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(latency)
+            path = urlsplit(self.path).path
+            body = routes.get("/points/" if path.startswith("/points/") else path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/geo+json")
+            self.send_header("Cache-Control", "max-age=3600")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    lock = threading.Lock()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.connections = 0
+    scheme = "http"
+    if certfile:
+        import ssl
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        # Handshake in the handler thread (setup), not in the accept loop
+        server.socket = context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+        scheme = "https"
+    base = f"{scheme}://127.0.0.1:{server.server_address[1]}"
+    grid = "/gridpoints/TST/10,10"
+    observation = {
+        "textDescription": "Sunny",
+        "temperature": {"value": 25.0, "unitCode": "wmoUnit:degC"},
+        "windSpeed": {"value": 10.0, "unitCode": "wmoUnit:km_h-1"},
+        "relativeHumidity": {"value": 30.0, "unitCode": "wmoUnit:percent"},
+    }
+    documents = {
+        "/points/": {"properties": {"forecast": f"{base}{grid}/forecast", "forecastHourly": f"{base}{grid}/forecast/hourly",
+                                    "observationStations": f"{base}{grid}/stations"}},
+        f"{grid}/stations": {"features": [{"properties": {"stationIdentifier": "KTST"}}]},
+        f"{grid}/forecast": hourly_body(14),
+        f"{grid}/forecast/hourly": hourly_body(156),
+        "/stations/KTST/observations/latest": {"properties": observation},
+        "/alerts/active": {"features": []},
+    }
+    routes = {path: json.dumps(document).encode("utf-8") for path, document in documents.items()}
+    return server, base
+
+
+def benchmark_refresh(latency=0.1, connect_latency=None):
+    """
+    Milliseconds per request and in total for fetch_weather against an HTTPS nws_stub_server(latency)
+    with a throwaway self-signed certificate. Each new connection also costs connect_latency
+    (default 2 * latency: the TCP and TLS round trips). Runs, in order:
+
+    cold            nothing cached, on a fresh make_http_session()
+    new_session     caches warm (gridpoints cached, the rest 304s), on another fresh session
+    reused_session  the same warm caches again, on the session new_session just used
+
+    so new_session against reused_session is the cost of the connections and TLS handshakes that
+    keeping one pooled session saves. Each run also reports the connections the stub accepted,
+    the sum of its requests and its longest dependent chain (points, then stations -> observation
+    or one forecast); with the fan-out, total should track the chain. The caches go to a
+    temporary database, so the real ones are left alone.
+    """
+    global NWS_BASE, CACHE_DB_PATH, http_session
+    import tempfile
+
+    if connect_latency is None:
+        connect_latency = 2 * latency
+    address = "weather benchmark stub"
+    key = normalize_address(address)
+    saved = NWS_BASE, CACHE_DB_PATH, http_session
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = self_signed_cert(directory)
+        server, base = nws_stub_server(latency, certfile, keyfile, connect_latency)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        sessions = []
+
+        def fresh_session():
+            session = make_http_session()
+            session.verify = certfile
+            session.trust_env = False  # no proxies, and REQUESTS_CA_BUNDLE must not override verify
+            sessions.append(session)
+            return session
+
+        NWS_BASE, CACHE_DB_PATH = base, os.path.join(directory, "benchmark_cache.sqlite3")
+        with geocode_lock:
+            geocode_memory[key] = (40.0, -100.0, time.time())
+        try:
+            results = {"latency_ms": latency * 1000, "connect_latency_ms": connect_latency * 1000}
+            for run in ("cold", "new_session", "reused_session"):
+                with host_slots_lock:
+                    if run != "reused_session":
+                        http_session = fresh_session()
+                connections = server.connections
+                result = fetch_weather(address, load_images=False)
+                if result["error"]:
+                    raise RuntimeError(result["error"])
+                timings = dict(fetch_timings)
+                chain = timings.get("points", 0) + max(timings.get("stations", 0) + timings["observation"],
+                                                       timings["forecast"], timings["forecastHourly"], timings["alerts"])
+                timings["sum_of_requests"] = sum(seconds for name, seconds in fetch_timings.items() if name != "total")
+                timings["longest_chain"] = chain
+                results[run] = {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+                results[run]["connections"] = server.connections - connections
+            return results
+        finally:
+            with host_slots_lock:
+                NWS_BASE, CACHE_DB_PATH, http_session = saved
+            for session in sessions:
+                session.close()
+            with geocode_lock:
+                geocode_memory.pop(key, None)
+            with points_lock:
+                points_memory.pop(points_key(40.0, -100.0), None)
+            with response_store_lock:
+                for url in [url for url in response_store if url.startswith(base)]:
+                    del response_store[url]
+            server.shutdown()
+            server.server_close()
+
+
+# Packages "import weather" must not load; they are imported lazily where they are used
+HEAVY_IMPORTS = ("tkinter", "matplotlib", "PIL", "geopy", "requests")
+
+
+def benchmark_import():
+    """
+    Run "import weather" in a fresh interpreter under -X importtime. Returns its cumulative
+    import time in ms and the HEAVY_IMPORTS that it loaded (should be none).
+    """
+    import subprocess
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import weather"],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+    import_ms = None
+    heavy = set()
+    # Lines look like "import time:       312 |       1045 |   weather"
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        module = parts[2].strip()
+        if module.split(".")[0] in HEAVY_IMPORTS:
+            heavy.add(module.split(".")[0])
+        if module == "weather":
+            import_ms = int(parts[1]) / 1000
+    return {"import_ms": import_ms, "heavy_imports": sorted(heavy)}
+
+
+def cli(argv=None):
+    """weather command: print the forecast for one or more addresses as JSON."""
+    parser = argparse.ArgumentParser(prog="weather", description="Weather by address (JSON output)")
+    parser.add_argument("addresses", nargs="*", help="addresses, cities or states within the United States")
+    parser.add_argument("--batch", metavar="FILE", help="file with one address per line")
+    parser.add_argument("--report", metavar="PATH", help="write a .json or .csv report instead of printing JSON")
+    parser.add_argument("--workers", type=int, default=8, help="addresses fetched at once")
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace-event JSON file of every stage")
+    parser.add_argument("--ingest", metavar="STATION", action="append", default=[],
+                        help="archive a station's observation history (e.g. KPHX) instead of fetching forecasts")
+    parser.add_argument("--days", type=float, default=7, help="days of history to ingest for a station with no archive yet")
+    parser.add_argument("--benchmark-units", metavar="N", type=int,
+                        help="time per-observation vs columnar unit conversion on N synthetic observations")
+    parser.add_argument("--benchmark-decode", action="store_true",
+                        help="time the old and current JSON decoding of a 156-period hourly forecast")
+    parser.add_argument("--benchmark-refresh", metavar="LATENCY_MS", type=float, nargs="?", const=100,
+                        help="time fetches on a new and a reused session against a local HTTPS NWS stub "
+                             "answering after LATENCY_MS (default 100)")
+    parser.add_argument("--benchmark-import", action="store_true",
+                        help="time 'import weather' with -X importtime; exit 1 if it loads a GUI or network package")
+    args = parser.parse_args(argv)
+    set_tracing(bool(args.trace))
+
+    if args.benchmark_import:
+        result = benchmark_import()
+        print(json.dumps(result, indent=2))
+        return 1 if result["heavy_imports"] else 0
+
+    if args.benchmark_refresh is not None:
+        print(json.dumps(benchmark_refresh(args.benchmark_refresh / 1000), indent=2))
+        return 0
+
+    if args.benchmark_decode:
+        print(json.dumps(benchmark_decoding(), indent=2))
+        return 0
+
+    if args.benchmark_units:
+        print(json.dumps(benchmark_conversions(args.benchmark_units), indent=2))
+        return 0
+
+    if args.ingest:
+        for station_id in args.ingest:
+            added = ingest_observations(station_id, since=time.time() - args.days * 86400)
+            print(f"{station_id}: {added} new observations archived in {archive_dir(station_id)}")
+        if args.trace:
+            export_trace(args.trace)
+        return 0
+
+    addresses = list(args.addresses)
+    if args.batch:
+        with open(args.batch, encoding="utf-8") as f:
+            addresses += [line.strip() for line in f if line.strip()]
+    if not addresses:
+        parser.error("give at least one address or --batch FILE")
+
+    results = run_batch(addresses, args.workers)
+    if args.trace:
+        export_trace(args.trace)
+    if args.report:
+        write_batch_report(results, args.report)
+        print(f"Wrote {len(addresses)} locations to {args.report}")
+    else:
+        print(json.dumps(json_report(results), indent=2))
+    return 0 if all(not r["error"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(cli())